@@ -0,0 +1,164 @@
+# coding=utf-8
+from collections import OrderedDict
+
+
+# 缓存替换策略, 块缓存(file_manager)与页面置换(memory_manager)共用.
+# request(key)访问key, 命中返回True, 未命中时装入key并返回False, 被淘汰的键记在victim中
+
+
+class LRUPolicy:
+    ''' 最近最少使用: OrderedDict按访问先后排列, 淘汰最前面的块. '''
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self.victim = None  # 上一次request淘汰的键, 没有淘汰时为None
+
+    # 访问key, 命中返回True; 未命中时装入key(必要时淘汰, 被淘汰的键记在victim中), 返回False
+    def request(self, key):
+        self.victim = None
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return True
+        self.entries[key] = None
+        if len(self.entries) > self.capacity:
+            self.victim, _ = self.entries.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def remove(self, key):
+        self.entries.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ClockPolicy:
+    ''' 时钟(二次机会)算法: 块排成一圈, 每块一个访问位, 指针扫过访问位为1的块时清零, 淘汰第一个访问位为0的块. '''
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.keys = []  # 圈上各位置的块, None表示空位
+        self.referenced = []
+        self.slot_of = {}  # 块 -> 圈上的位置
+        self.free_slots = []
+        self.hand = 0
+        self.evictions = 0
+        self.victim = None
+
+    def request(self, key):
+        self.victim = None
+        slot = self.slot_of.get(key)
+        if slot is not None:
+            self.referenced[slot] = True
+            return True
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        elif len(self.keys) < self.capacity:
+            slot = len(self.keys)
+            self.keys.append(None)
+            self.referenced.append(False)
+        else:
+            while self.referenced[self.hand]:
+                self.referenced[self.hand] = False
+                self.hand = (self.hand + 1) % self.capacity
+            slot = self.hand
+            self.hand = (self.hand + 1) % self.capacity
+            self.victim = self.keys[slot]
+            del self.slot_of[self.victim]
+            self.evictions += 1
+        self.keys[slot] = key
+        self.referenced[slot] = False
+        self.slot_of[key] = slot
+        return False
+
+    def remove(self, key):
+        slot = self.slot_of.pop(key, None)
+        if slot is not None:
+            self.keys[slot] = None
+            self.referenced[slot] = False
+            self.free_slots.append(slot)
+
+    def __contains__(self, key):
+        return key in self.slot_of
+
+    def __len__(self):
+        return len(self.slot_of)
+
+
+class ARCPolicy:
+    ''' 自适应替换缓存(ARC): t1存只访问过一次的块, t2存访问过多次的块,
+        b1/b2记录刚从t1/t2淘汰的块(只有键, 不占缓存), 命中b1/b2时调整t1的目标大小p. '''
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.t1 = OrderedDict()
+        self.t2 = OrderedDict()
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+        self.p = 0
+        self.evictions = 0
+        self.victim = None
+
+    # 缓存已满时从t1或t2淘汰一块, 放入对应的b1或b2
+    def _replace(self, in_b2):
+        if len(self.t1) + len(self.t2) < self.capacity:
+            return
+        if self.t1 and (len(self.t1) > self.p or (in_b2 and len(self.t1) == self.p) or not self.t2):
+            self.victim, _ = self.t1.popitem(last=False)
+            self.b1[self.victim] = None
+        else:
+            self.victim, _ = self.t2.popitem(last=False)
+            self.b2[self.victim] = None
+        self.evictions += 1
+
+    def request(self, key):
+        self.victim = None
+        if key in self.t1:
+            del self.t1[key]
+            self.t2[key] = None
+            return True
+        if key in self.t2:
+            self.t2.move_to_end(key)
+            return True
+        if key in self.b1:
+            self.p = min(self.capacity, self.p + max(len(self.b2) // len(self.b1), 1))
+            self._replace(False)
+            del self.b1[key]
+            self.t2[key] = None
+            return False
+        if key in self.b2:
+            self.p = max(0, self.p - max(len(self.b1) // len(self.b2), 1))
+            self._replace(True)
+            del self.b2[key]
+            self.t2[key] = None
+            return False
+        l1 = len(self.t1) + len(self.b1)
+        total = l1 + len(self.t2) + len(self.b2)
+        if l1 >= self.capacity:
+            if len(self.t1) < self.capacity:
+                self.b1.popitem(last=False)
+                self._replace(False)
+            else:
+                self.victim, _ = self.t1.popitem(last=False)
+                self.evictions += 1
+        elif total >= self.capacity:
+            if total >= 2 * self.capacity:
+                self.b2.popitem(last=False)
+            self._replace(False)
+        self.t1[key] = None
+        return False
+
+    def remove(self, key):
+        for entries in (self.t1, self.t2, self.b1, self.b2):
+            entries.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.t1 or key in self.t2
+
+    def __len__(self):
+        return len(self.t1) + len(self.t2)
@@ -5,6 +5,7 @@ memory_management_mode = 'p'
 memory_page_size = 1024
 memory_page_number = 16
 memory_physical_page_number = 8
+memory_page_replacement = 'FIFO'  # from: {FIFO, LRU, CLOCK, LFU, ARC}, OPT is replayed on the same accesses for reference
 
 # config about process scheduling
 priority = True
@@ -17,5 +18,21 @@ printer_num = 1
 storage_block_size = 512
 storage_track_num = 200
 storage_sec_num = 12
+storage_backend = 'host'  # from: {host, image}, image stores the whole volume in one mmap-ed file
+storage_image_meta_blocks = 32  # blocks reserved for metadata in the image backend
+storage_exec_cache_size = 64  # number of parsed files kept by get_file
+storage_max_extents = 8  # a file may be split into at most this many extents, 1 means contiguous only
+storage_block_cache_size = 256  # blocks kept by the block cache in front of the disk, 0 disables it
+storage_block_cache_policy = 'LRU'  # from: {LRU, CLOCK, ARC}
+storage_read_ahead_max = 64  # largest adaptive read-ahead window in blocks, 0 disables read-ahead
+storage_write_buffer_blocks = 64  # dirty blocks kept before writing back, 0 writes through
+storage_write_buffer_age = 5  # seconds a dirty block may wait before it is written back
+storage_disk_num = 1  # more than one disk forms a RAID volume
+storage_raid_level = 0  # from: {0, 1}, 0 stripes blocks across the disks, 1 mirrors every block on all disks
+storage_stripe_size = 4  # blocks per stripe
 
-seek_algo = 'FCFS'  # from: {FCFS, SSTF, SCAN, C_SCAN, LOOK, C_LOOK}
+disk_virtual_clock = False  # True: simulate seek/rotation latency on a virtual clock instead of sleeping
+disk_rotational_model = False  # True: track the platter angle, rotational delay depends on the requested sector
+disk_request_queue = False  # True: all disk reads go through one shared queue, merged and ordered by seek_algo
+
+seek_algo = 'FCFS'  # from: {FCFS, SSTF, SCAN, C_SCAN, LOOK, C_LOOK, SATF, DEADLINE}
@@ -0,0 +1,141 @@
+# coding=utf-8
+import argparse
+import json
+import numpy as np
+import pandas as pd
+from file_manager import Disk
+from config import storage_block_size, storage_track_num, storage_sec_num
+
+
+# workload generators: each returns a list of batches, a batch is a list of (track, sector)
+# that arrive together and are ordered by the seek algorithm as one queue
+
+def uniform_workload(rng, requests, batch_size, tracks, secs):
+    addrs = list(zip(rng.integers(0, tracks, requests).tolist(), rng.integers(0, secs, requests).tolist()))
+    return [addrs[i:i + batch_size] for i in range(0, requests, batch_size)]
+
+
+def zipf_workload(rng, requests, batch_size, tracks, secs, zipf_s=1.2):
+    # track popularity follows a Zipf law over a random permutation of the tracks
+    weights = 1.0 / np.arange(1, tracks + 1) ** zipf_s
+    hot = rng.permutation(tracks)
+    chosen = hot[rng.choice(tracks, requests, p=weights / weights.sum())]
+    addrs = list(zip(chosen.tolist(), rng.integers(0, secs, requests).tolist()))
+    return [addrs[i:i + batch_size] for i in range(0, requests, batch_size)]
+
+
+def sequential_workload(rng, requests, batch_size, tracks, secs, run_length=16):
+    # runs of consecutive blocks starting at random blocks, like reading whole files
+    block_number = tracks * secs
+    starts = rng.integers(0, block_number, requests // run_length + 1)
+    blocks = (starts[:, None] + np.arange(run_length)).ravel()[:requests] % block_number
+    addrs = list(zip((blocks // secs).tolist(), (blocks % secs).tolist()))
+    return [addrs[i:i + batch_size] for i in range(0, requests, batch_size)]
+
+
+def bursty_workload(rng, requests, batch_size, tracks, secs, burst_factor=8):
+    # mostly small batches of random requests, now and then a large burst of sequential runs
+    uniform = uniform_workload(rng, requests, 1, tracks, secs)
+    sequential = sequential_workload(rng, requests, 1, tracks, secs)
+    batches = []
+    done = 0
+    while done < requests:
+        burst = rng.random() < 0.2
+        size = min(requests - done, batch_size * burst_factor if burst else int(rng.integers(1, batch_size + 1)))
+        source = sequential if burst else uniform
+        batches.append([source[i][0] for i in range(done, done + size)])
+        done += size
+    return batches
+
+
+workloads = {
+    'uniform': uniform_workload,
+    'zipf': zipf_workload,
+    'sequential': sequential_workload,
+    'bursty': bursty_workload,
+}
+
+
+def jain_fairness(values):
+    values = np.asarray(values, dtype=np.float64)
+    square_sum = (values ** 2).sum()
+    return float(values.sum() ** 2 / (len(values) * square_sum)) if square_sum else 1.0
+
+
+def run_algo(batches, algo, tracks, secs, block_size, head=53, rotational=False):
+    """
+    replay the batches on a simulated-time disk, every batch arrives when the previous one is done
+    :return: dict of metrics: throughput, mean/p99 seek distance and Jain fairness of response times
+    """
+    disk = Disk(block_size, tracks, secs, now_headpointer=head, virtual_clock=True, rotational=rotational)
+    seek_distances = []
+    response_times = []
+    total_time = 0
+    for batch in batches:
+        seek_queue = disk.schedule(list(batch), algo)
+        distances, times = disk.service_times(seek_queue)
+        disk.now_headpointer = seek_queue[-1][0]
+        disk.clock += float(times.sum())
+        # turnaround points of SCAN and C_SCAN have sector -1, their movement counts to the next request
+        real = np.array([seek_addr[1] != -1 for seek_addr in seek_queue])
+        seek_distances.append(np.diff(np.cumsum(distances)[real], prepend=0))
+        response_times.append(np.cumsum(times)[real])
+        total_time += float(times.sum())
+    seek_distances = np.concatenate(seek_distances)
+    response_times = np.concatenate(response_times)
+    requests = len(seek_distances)
+    return {
+        'algo': algo,
+        'requests': requests,
+        'time_s': total_time,
+        'throughput_Bps': requests * block_size / total_time if total_time else 0,
+        'iops': requests / total_time if total_time else 0,
+        'mean_seek_distance': float(seek_distances.mean()),
+        'p99_seek_distance': float(np.percentile(seek_distances, 99)),
+        'mean_response_ms': float(response_times.mean() * 1000),
+        'p50_response_ms': float(np.percentile(response_times, 50) * 1000),
+        'p95_response_ms': float(np.percentile(response_times, 95) * 1000),
+        'p99_response_ms': float(np.percentile(response_times, 99) * 1000),
+        'jain_fairness': jain_fairness(response_times),
+    }
+
+
+def run_benchmark(workload_names=tuple(workloads), algos=Disk.seek_algos, requests=10000, batch_size=32,
+                  tracks=storage_track_num, secs=storage_sec_num, block_size=storage_block_size, seed=0,
+                  rotational=False):
+    rows = []
+    for name in workload_names:
+        # every algorithm sees exactly the same batches
+        batches = workloads[name](np.random.default_rng(seed), requests, batch_size, tracks, secs)
+        for algo in algos:
+            row = {'workload': name, 'rotational': rotational}
+            row.update(run_algo(batches, algo, tracks, secs, block_size, rotational=rotational))
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare the disk seek algorithms on generated workloads')
+    parser.add_argument('--workloads', nargs='+', default=list(workloads), choices=list(workloads))
+    parser.add_argument('--algos', nargs='+', default=list(Disk.seek_algos), choices=list(Disk.seek_algos))
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--tracks', type=int, default=storage_track_num)
+    parser.add_argument('--secs', type=int, default=storage_sec_num)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rotational', action='store_true',
+                        help='use the rotational model, rotational delay depends on the sector (compare with SATF)')
+    parser.add_argument('--out', default='disk_benchmark', help='write <out>.csv and <out>.json')
+    args = parser.parse_args()
+
+    result = run_benchmark(args.workloads, args.algos, args.requests, args.batch_size,
+                           args.tracks, args.secs, storage_block_size, args.seed, args.rotational)
+    result.to_csv(args.out + '.csv', index=False)
+    with open(args.out + '.json', 'w') as f:
+        json.dump(result.to_dict(orient='records'), f, indent=2)
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(result.round(3).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
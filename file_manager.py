@@ -1,41 +1,475 @@
 # coding=utf-8
 import json
 import os
-import copy
+import mmap
+import shutil
+import struct
 import time
+from array import array
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+from cache_policy import LRUPolicy, ClockPolicy, ARCPolicy
 
 
-class Block:
-    def __init__(self, total_space, loc):
-        self.total_space = total_space
-        self.free_space = total_space
-        self.fp = None
-        self.loc = loc
+class BlockTable:
+    ''' 按列存放的块表, 每列是一个以块号为下标的numpy数组, 代替每块一个Block对象.
+        free_space: 块内剩余空间(Byte)
+        owner:      占用该块的文件号, -1表示没有文件
+        track / sector: 预先算好的块所在磁道号与扇区号 '''
 
-    def set_free_space(self, fs):
-        self.free_space = fs
-
-    def get_free_space(self):
-        return self.free_space
+    def __init__(self, block_number, block_size, secs):
+        self.block_size = block_size
+        self.free_space = np.full(block_number, block_size, dtype=np.int32)
+        self.owner = np.full(block_number, -1, dtype=np.int32)
+        block_nums = np.arange(block_number, dtype=np.int32)
+        self.track = block_nums // secs
+        self.sector = block_nums % secs
+
+    def nbytes(self):
+        return self.free_space.nbytes + self.owner.nbytes + self.track.nbytes + self.sector.nbytes
+
+
+class FreeExtentMap:
+    ''' 空闲区段索引, 与bitmap同步维护, 每个区段为 (起始块号, 长度).
+        starts:  按起始块号排序的区段起点, 用于定位某块所在的区段
+        by_size: 按 (长度, 起点) 排序, 供best fit二分查找
+        tree:    以起始块号为下标、区段长度为值的最大值线段树, 供first fit / worst fit自顶向下查找
+        查询(定位区段, first/best/worst fit)为 O(log n); 分配, 释放时线段树更新为 O(log n),
+        但starts与by_size是普通有序list, insort/del 需移动后面的元素, 为 O(n) 的内存移动(常数很小). '''
+
+    def __init__(self, block_number):
+        self.block_number = block_number
+        self.leaf_base = 1
+        while self.leaf_base < block_number:
+            self.leaf_base *= 2
+        self.tree = array('i', [0]) * (2 * self.leaf_base)
+        self.starts = []
+        self.length_of = {}
+        self.by_size = []
+        self.free_blocks = 0
+
+    def build(self, bitmap):  # 由bitmap(1为空闲)一次性重建索引
+        bits = (np.asarray(bitmap) != 0).astype(np.int8)
+        edges = np.diff(np.concatenate(([0], bits, [0])))
+        starts = np.nonzero(edges == 1)[0]
+        lengths = np.nonzero(edges == -1)[0] - starts
+        self.starts = starts.tolist()
+        self.length_of = dict(zip(self.starts, lengths.tolist()))
+        self.by_size = sorted(zip(lengths.tolist(), self.starts))
+        self.free_blocks = int(lengths.sum())
+        # 线段树自底向上逐层建立
+        tree = np.zeros(2 * self.leaf_base, dtype=np.int32)
+        tree[self.leaf_base + starts] = lengths
+        n = self.leaf_base
+        while n > 1:
+            tree[n // 2:n] = np.maximum(tree[n:2 * n:2], tree[n + 1:2 * n:2])
+            n //= 2
+        self.tree = array('i', tree.tobytes())
+
+    def _set_leaf(self, start, length):
+        i = self.leaf_base + start
+        self.tree[i] = length
+        i //= 2
+        while i:
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+            i //= 2
+
+    def _add(self, start, length):
+        insort(self.starts, start)
+        self.length_of[start] = length
+        insort(self.by_size, (length, start))
+        self._set_leaf(start, length)
+
+    def _remove(self, start):
+        length = self.length_of.pop(start)
+        del self.starts[bisect_left(self.starts, start)]
+        del self.by_size[bisect_left(self.by_size, (length, start))]
+        self._set_leaf(start, 0)
+        return length
+
+    # 将 [start, start + length) 标记为已占用, 这些块必须全部空闲
+    def allocate(self, start, length):
+        idx = bisect_right(self.starts, start) - 1
+        if idx < 0:
+            raise ValueError('block %d is not free' % start)
+        ext_start = self.starts[idx]
+        ext_end = ext_start + self.length_of[ext_start]
+        if ext_end < start + length:
+            raise ValueError('block %d is not free' % start)
+        self._remove(ext_start)
+        if ext_start < start:
+            self._add(ext_start, start - ext_start)
+        if start + length < ext_end:
+            self._add(start + length, ext_end - start - length)
+        self.free_blocks -= length
+
+    # 将 [start, start + length) 标记为空闲, 并与前后相邻的空闲区段合并
+    def release(self, start, length):
+        end = start + length
+        idx = bisect_left(self.starts, start)
+        if idx > 0:
+            prev = self.starts[idx - 1]
+            if prev + self.length_of[prev] == start:
+                start = prev
+                self._remove(prev)
+        if end in self.length_of:
+            end += self._remove(end)
+        self._add(start, end - start)
+        self.free_blocks += length
+
+    def _leftmost_at_least(self, num):  # 线段树中第一个长度 >= num 的区段起点
+        if num <= 0 or self.tree[1] < num:
+            return -1
+        i = 1
+        while i < self.leaf_base:
+            i *= 2
+            if self.tree[i] < num:
+                i += 1
+        return i - self.leaf_base
+
+    def first_fit(self, num):
+        return self._leftmost_at_least(num)
+
+    def best_fit(self, num):  # 长度 >= num 的最短区段, 等长时取起点最小者
+        idx = bisect_left(self.by_size, (num, -1))
+        if idx == len(self.by_size):
+            return -1
+        return self.by_size[idx][1]
 
-    def set_fp(self, fp):
-        self.fp = fp
+    def worst_fit(self, num):  # 最长的区段, 等长时取起点最小者
+        if self.tree[1] < num:
+            return -1
+        return self._leftmost_at_least(self.tree[1])
+
+    def largest(self):
+        return self.tree[1]
+
+    # 碎片率: 1 - 最大空闲区段 / 全部空闲块, 为0时空闲空间完全连续
+    def fragmentation(self):
+        if self.free_blocks == 0:
+            return 0.0
+        return 1 - self.largest() / self.free_blocks
+
+    def extents(self):
+        return [(start, self.length_of[start]) for start in self.starts]
+
+
+class ExecutableCache:
+    ''' 已解析文件的LRU缓存, 以 (路径, 修改戳) 为键, 路径相同但修改戳不符时视为未命中.
+        命中时get_file只需模拟寻道, 不再打开与解析文件. '''
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.entries = OrderedDict()  # 路径 -> (修改戳, 解析后的文件)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, stamp):
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != stamp:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(path)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, path, stamp, file):
+        self.entries[path] = (stamp, file)
+        self.entries.move_to_end(path)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, path):
+        self.entries.pop(path, None)
+
+
+class BlockCache:
+    ''' 位于FileManager与Disk之间的块缓存, 以 (磁道号, 扇区号) 为键.
+        读文件时只有未命中的块交给磁盘访问; 块被释放(删除, 搬动)时从缓存中去掉. '''
+    policies = {'LRU': LRUPolicy, 'CLOCK': ClockPolicy, 'ARC': ARCPolicy}
+
+    def __init__(self, capacity=256, policy='LRU', block_size=512):
+        if policy not in self.policies:
+            raise ValueError("no such block cache policy '" + policy + "'")
+        self.capacity = capacity
+        self.policy_name = policy
+        self.policy = self.policies[policy](capacity)
+        self.block_size = block_size
+        self.hits = 0
+        self.misses = 0
+
+    # 返回seek_queue中未命中的块(保持原顺序), 它们同时被装入缓存
+    def filter(self, seek_queue):
+        request = self.policy.request
+        missing = [seek_addr for seek_addr in seek_queue if not request(seek_addr)]
+        self.misses += len(missing)
+        self.hits += len(seek_queue) - len(missing)
+        return missing
+
+    # 预读: 把不在缓存中的块装入缓存并返回它们, 不计入命中与未命中
+    def prefetch(self, seek_queue):
+        missing = [seek_addr for seek_addr in seek_queue if seek_addr not in self.policy]
+        for seek_addr in missing:
+            self.policy.request(seek_addr)
+        return missing
+
+    def invalidate(self, seek_addrs):
+        for seek_addr in seek_addrs:
+            self.policy.remove(seek_addr)
+
+    @property
+    def evictions(self):
+        return self.policy.evictions
+
+    def hit_ratio(self):
+        accesses = self.hits + self.misses
+        return self.hits / accesses if accesses else 0
+
+    # 命中的块省去的磁盘读写量
+    def bytes_saved(self):
+        return self.hits * self.block_size
+
+    def status(self):
+        return "block cache ({}): hit ratio {:.2%}, {} hit(s), {} miss(es), {} eviction(s), {} B saved, {} / {} block(s) cached".format(
+            self.policy_name, self.hit_ratio(), self.hits, self.misses, self.evictions,
+            self.bytes_saved(), len(self.policy), self.capacity)
+
+
+class ReadAhead:
+    ''' 自适应预读: 本次读取从上次读取的末尾(或上次预读的范围内)开始时视为顺序读,
+        把其后window个已占用的块一并读入块缓存. 上一批预读的块被读到一半以上时窗口加倍,
+        不足四分之一时减半; 顺序读中断时窗口减半, 未被读到的预读块记为浪费. '''
+
+    def __init__(self, max_window=64, min_window=4):
+        self.min_window = min(min_window, max_window)
+        self.max_window = max_window
+        self.window = self.min_window
+        self.next_block = None  # 顺序读时下一次读取应开始的块号
+        self.pending = {}  # 已预读但还没被读到的块 -> 预读时使用的寻道算法
+        self.last_issued = 0  # 上一批预读的块数, 与其后读到的预读块数一起决定窗口的增减
+        self.used_since = 0
+        self.sequential = 0
+        self.wasted = 0
+        self.stats = {}  # 寻道算法 -> [预读块数, 被读到的预读块数]
+
+    # blocks为本次按需读取的块号, owner为块表的owner列; 返回可以预读的块号, 真正读入的块由issue登记
+    def plan(self, blocks, owner):
+        for block in blocks.tolist():
+            algo = self.pending.pop(block, None)
+            if algo is not None:
+                self.stats[algo][1] += 1
+                self.used_since += 1
+        first, last = int(blocks[0]), int(blocks.max())
+        sequential = self.next_block is not None and \
+            self.next_block <= first <= self.next_block + self.window
+        if self.last_issued:
+            if not sequential or self.used_since * 4 < self.last_issued:
+                self.window = max(self.min_window, self.window // 2)
+            elif self.used_since * 2 >= self.last_issued:
+                self.window = min(self.max_window, self.window * 2)
+        if not sequential:
+            self.wasted += len(self.pending)
+            self.pending.clear()
+        self.last_issued = 0
+        self.used_since = 0
+        self.next_block = last + 1
+        if not sequential:
+            return []
+        self.sequential += 1
+        candidates = np.arange(last + 1, min(last + 1 + self.window, len(owner)))
+        return [block for block in candidates[owner[candidates] >= 0].tolist() if block not in self.pending]
+
+    # 登记本次预读真正读入块缓存的块, 已在缓存中的候选块不计入预读与浪费
+    def issue(self, blocks, seek_algo):
+        for block in blocks:
+            self.pending[block] = seek_algo
+        self.stats.setdefault(seek_algo, [0, 0])[0] += len(blocks)
+        self.last_issued = len(blocks)
+
+    def status(self):
+        lines = ["read-ahead: window {} block(s), {} sequential read(s), {} wasted block(s)".format(
+            self.window, self.sequential, self.wasted)]
+        for algo, (issued, used) in self.stats.items():
+            lines.append("    {:<7} prefetched {} block(s), used {} ({:.1%})".format(
+                algo, issued, used, used / issued if issued else 0))
+        return '\n'.join(lines)
+
+
+class WriteBuffer:
+    ''' 写回缓冲: 写入的块先记为脏块, 写回前同一块再次写入不会多写一次盘, 块被释放时直接丢弃.
+        脏块数达到max_dirty或最早的脏块已等待max_age秒时整批写回: 脏块按块号排序,
+        相邻的块合并为一段连续的写. max_dirty为0时每次写入都立即写回(写直达). '''
+
+    def __init__(self, max_dirty=64, max_age=5.0):
+        self.max_dirty = max_dirty
+        self.max_age = max_age
+        self.dirty = {}  # 块号 -> 变脏的时刻, 按变脏的先后排列
+        self.user_bytes = 0  # 调用者写入的字节数
+        self.disk_bytes = 0  # 实际写盘的字节数(RAID-1中每块磁盘都要写)
+        self.coalesced = 0  # 写回前被再次写入的块数
+        self.cancelled = 0  # 写回前已被释放的块数
+        self.flushes = 0
+        self.runs = 0  # 写回的连续段数
+        self.flush_latencies = []  # 每次写回的耗时(单位:S)
+
+    def write(self, blocks, nbytes):
+        self.user_bytes += nbytes
+        now = time.time()
+        for block in blocks:
+            if block in self.dirty:
+                self.coalesced += 1
+            else:
+                self.dirty[block] = now
+
+    def discard(self, blocks):
+        for block in blocks:
+            if self.dirty.pop(block, None) is not None:
+                self.cancelled += 1
+
+    def due(self):
+        if not self.dirty:
+            return False
+        return len(self.dirty) >= self.max_dirty or time.time() - next(iter(self.dirty.values())) >= self.max_age
+
+    # 取出全部脏块, 返回按块号排序的块号列表与连续段数
+    def take(self):
+        blocks = sorted(self.dirty)
+        self.dirty.clear()
+        runs = sum(1 for i, block in enumerate(blocks) if i == 0 or blocks[i - 1] + 1 != block)
+        return blocks, runs
+
+    def record_flush(self, runs, disk_bytes, latency):
+        self.flushes += 1
+        self.runs += runs
+        self.disk_bytes += disk_bytes
+        self.flush_latencies.append(latency)
+
+    def write_amplification(self):
+        return self.disk_bytes / self.user_bytes if self.user_bytes else 0
+
+    def status(self):
+        latencies = np.array(self.flush_latencies) * 1000
+        return ("write buffer: {} dirty block(s), {} coalesced, {} cancelled, write amplification {:.2f} "
+                "({} B written for {} B requested)\n"
+                "    {} flush(es) in {} run(s), flush latency mean {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms").format(
+            len(self.dirty), self.coalesced, self.cancelled, self.write_amplification(), self.disk_bytes,
+            self.user_bytes, self.flushes, self.runs, latencies.mean() if len(latencies) else 0,
+            np.percentile(latencies, 99) if len(latencies) else 0, latencies.max() if len(latencies) else 0)
+
+
+class DiskImage:
+    ''' 单一磁盘镜像文件后端, 文件大小为 块数 * 块大小, 通过mmap访问.
+        前meta_blocks块为元数据区(超级块), 存放文件树, block_dir与空闲区段;
+        元数据超出元数据区时溢出到数据块中, 元数据区只记录溢出块的区段(spill);
+        其余块存放文件数据, 文件数据按区段顺序依次存放, 开头用4字节记录数据长度. '''
+    magic = b'MINIOSIM'
+    meta_header = struct.Struct('<8sI')
+    data_header = struct.Struct('<I')
+
+    def __init__(self, path, block_size, block_number, meta_blocks):
+        self.path = path
+        self.block_size = block_size
+        self.meta_blocks = meta_blocks
+        size = block_size * block_number
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            with open(path, 'wb') as f:  # 新建(或磁盘参数改变时重建)全零的镜像
+                f.truncate(size)
+        self.file = open(path, 'r+b')
+        self.mm = mmap.mmap(self.file.fileno(), size)
+        self.view = memoryview(self.mm)
+
+    # 读取元数据区, 未初始化或损坏时返回None
+    def load_meta(self):
+        magic, length = self.meta_header.unpack_from(self.mm, 0)
+        if magic != self.magic:
+            return None
+        start = self.meta_header.size
+        try:
+            metadata = json.loads(str(self.view[start:start + length], 'utf-8'))
+            if 'spill' in metadata:  # 元数据溢出到了数据块中
+                spill = [tuple(extent) for extent in metadata['spill']]
+                metadata = json.loads(str(self.read_file(spill), 'utf-8'))
+                metadata['spill'] = spill
+            return metadata
+        except ValueError:
+            return None
+
+    # 写入元数据区, 超出元数据区大小时返回False
+    def save_meta(self, metadata):
+        data = json.dumps(metadata).encode('utf-8')
+        if self.meta_header.size + len(data) > self.meta_blocks * self.block_size:
+            return False
+        start = self.meta_header.size
+        self.mm[start:start + len(data)] = data
+        self.meta_header.pack_into(self.mm, 0, self.magic, len(data))
+        return True
+
+    # 存放data所需的字节数(含长度头)
+    def stored_size(self, data):
+        return self.data_header.size + len(data)
+
+    # 读出存放在extents中的文件数据; 文件只有一个区段时返回映射区域的切片(不拷贝)
+    def read_file(self, extents):
+        offset = extents[0][0] * self.block_size
+        length, = self.data_header.unpack_from(self.mm, offset)
+        length += self.data_header.size
+        if length <= extents[0][1] * self.block_size:
+            return self.view[offset + self.data_header.size:offset + length]
+        parts = []
+        for start, count in extents:
+            offset = start * self.block_size
+            part = min(length, count * self.block_size)
+            parts.append(self.view[offset:offset + part])
+            length -= part
+            if length == 0:
+                break
+        return b''.join(parts)[self.data_header.size:]
+
+    def write_file(self, extents, data):
+        data = self.data_header.pack(len(data)) + data
+        for start, count in extents:
+            offset = start * self.block_size
+            part = data[:count * self.block_size]
+            self.mm[offset:offset + len(part)] = part
+            data = data[len(part):]
+            if not data:
+                break
 
-    def get_fp(self):
-        return self.fp
+    # 把从src开始的count块搬到dst, 区域可以重叠
+    def move_blocks(self, dst, src, count):
+        self.mm.move(dst * self.block_size, src * self.block_size, count * self.block_size)
 
-    def get_loc(self):
-        return self.loc
+    def close(self):
+        self.view.release()
+        self.mm.flush()
+        self.mm.close()
+        self.file.close()
 
 
 class FileManager:
     file_separator = os.sep
     root_path = os.getcwd() + file_separator + 'MiniOS_files'  # Win下为\, linux下需要修改!
-
-    def __init__(self, block_size=512, tracks=200, secs=12):  # block_size的单位:Byte
+    # 元数据清单(超级块): 正常卸载时保存文件树, block_dir与空闲区段, 下次挂载时直接读取
+    manifest_path = root_path + '.manifest'
+    manifest_version = 2
+    # backend为'image'时, 整个卷存放在这一个镜像文件中
+    image_path = os.getcwd() + file_separator + 'MiniOS_disk.img'
+
+    # backend: 'host' 每个文件对应MiniOS_files下的一个json文件; 'image' 使用单一的mmap磁盘镜像
+    # meta_blocks: image后端中元数据区占用的块数
+    # exec_cache_size: 已解析可执行文件缓存的容量(文件数)
+    # max_extents: 每个文件最多可以分成的区段数, 为1时只做连续分配
+    def __init__(self, block_size=512, tracks=200, secs=12, backend='host', meta_blocks=32,
+                 exec_cache_size=64, max_extents=8, virtual_clock=False,
+                 block_cache_size=256, block_cache_policy='LRU', read_ahead_max=64,
+                 rotational=False, disks=1, raid_level=0, stripe_size=4, seek_algo='FCFS',
+                 write_buffer_blocks=64, write_buffer_age=5.0):  # block_size的单位:Byte
         # 当前工作目录相对路径, 可以与root_path一起构成绝对路径
         self.current_working_path = self.file_separator
 
@@ -45,15 +479,66 @@ class FileManager:
         self.secs = secs
 
         self.unfillable_block = [3, 6, 9, 17]
+        self.max_extents = max_extents
+        # 目录项缓存: 规范化的绝对路径 -> 文件树中的节点(目录为字典, 文件为类型字符串)
+        self.dentry_cache = {}
+        self.dentry_cache_size = 4096
+        self.path_cache = {}
+        self.path_cache_size = 4096
+        # 已解析文件缓存, 以及每个文件的修改戳(mkf, chmod时更新, rm时删除)
+        self.exec_cache = ExecutableCache(exec_cache_size)
+        self.file_stamp = {}
+        self.stamp_counter = 0
+        # 块缓存, 容量为0时不使用
+        self.block_cache = BlockCache(block_cache_size, block_cache_policy, block_size) \
+            if block_cache_size > 0 else None
+        # 预读的块放在块缓存中, 没有块缓存或read_ahead_max为0时不预读
+        self.read_ahead = ReadAhead(read_ahead_max) \
+            if self.block_cache is not None and read_ahead_max > 0 else None
+        self.write_buffer = WriteBuffer(write_buffer_blocks, write_buffer_age)
+        # 文件路径 -> (区段列表, 文件大小), 区段为 (起始块号, 块数), 按文件内的顺序排列
         self.block_dir = {}
         self.bitmap = []
-        self.all_blocks = self._init_blocks()
-
-        self.set_unfillable_block()
-        self.file_system_tree = self._init_file_system_tree(self.root_path)
-        self.free_unfillable_block()
-
-        self.disk = Disk(block_size, tracks, secs)
+        # 文件号: 块表中只记录文件号, 文件号与路径的对应关系保存在这里
+        self.file_ids = {}
+        self.file_names = {}
+        self.next_file_id = 0
+        # 增量磁盘整理的进度: 扫描指针, 本轮已搬动的区段数与块数
+        self.tidy_cursor = 0
+        self.tidy_moved_extents = 0
+        self.tidy_moved_blocks = 0
+        self.block_table = self._init_blocks()
+
+        self.backend = backend
+        self.image = None
+        self.meta_spill = []  # image后端中元数据溢出所占的区段
+        self.meta_dirty = False  # image后端中元数据是否有尚未写回的修改
+        if backend == 'image':
+            self.image = DiskImage(self.image_path, block_size, self.block_number, meta_blocks)
+            self._occupy_blocks(0, meta_blocks)  # 元数据区
+            metadata = self.image.load_meta()
+            if metadata is not None and metadata.get('version') == self.manifest_version and \
+                    metadata.get('geometry') == [self.block_size, self.tracks, self.secs]:
+                self._load_metadata(metadata)
+                self.meta_spill = metadata.get('spill', [])
+            else:  # 新镜像, 从MiniOS_files导入
+                self.set_unfillable_block()
+                self.file_system_tree = self._init_file_system_tree(self.root_path)
+                self.free_unfillable_block()
+                self._save_metadata()
+        # 清单缺失或过期时, 才完整扫描MiniOS_files并重新分配块
+        elif not self.load_manifest():
+            self.set_unfillable_block()
+            self.file_system_tree = self._init_file_system_tree(self.root_path)
+            self.free_unfillable_block()
+
+        # 多块磁盘时组成RAID卷, 块表中的(磁道号, 扇区号)为卷上的逻辑地址
+        if disks > 1:
+            self.disk = DiskVolume(disks, raid_level, stripe_size, block_size, tracks, secs,
+                                   virtual_clock=virtual_clock, seek_algo=seek_algo, rotational=rotational)
+        else:
+            self.disk = Disk(block_size, tracks, secs, virtual_clock=virtual_clock, seek_algo=seek_algo,
+                             rotational=rotational)
 
     # return file, if failed, report error and return None.
     # file_path支持绝对路径, mode格式与函数open()约定的相同
@@ -63,26 +548,14 @@ class FileManager:
     def get_file_demo(self, seek_algo='FCFS'):
         seek_queue = [(98, 3), (183, 5), (37, 2), (122, 11), (119, 5), (14, 0),
                       (124, 8), (65, 5), (67, 1), (198, 5), (105, 5), (53, 3)]
-        if seek_algo == 'FCFS':
-            self.disk.FCFS(seek_queue)
-        elif seek_algo == 'SSTF':
-            self.disk.SSTF(seek_queue)
-        elif seek_algo == 'SCAN':
-            self.disk.SCAN(seek_queue)
-        elif seek_algo == 'C_SCAN':
-            self.disk.C_SCAN(seek_queue)
-        elif seek_algo == 'LOOK':
-            self.disk.LOOK(seek_queue)
-        elif seek_algo == 'C_LOOK':
-            self.disk.C_LOOK(seek_queue)
-        else:
+        if not self.disk.access(seek_queue, seek_algo):
             print(
                 "get_file: cannot get file. '" +
                 seek_algo +
                 "' no such disk seek algorithm")
 
-    def get_file(self, file_path, mode='r', seek_algo='FCFS'):
-        # 由于open()能完成绝大多数工作, 该函数的主要功能体现在排除异常:
+    # 检查file_path是否为已存在的普通文件, 是则返回其规范化的路径, 否则报错并返回None
+    def _resolve_file(self, file_path):
         (upper_path, basename) = self.path_split(file_path)
         current_working_dict = self.path2dict(upper_path)
         # 异常1.当路径文件夹不存在时, 报错,报错在 path2dict() 中进行
@@ -90,36 +563,10 @@ class FileManager:
             pass
         else:
             # 异常2.文件不存在
-            if basename in current_working_dict:
+            if isinstance(current_working_dict, dict) and basename in current_working_dict:
                 # 异常3.是文件夹
                 if not isinstance(current_working_dict[basename], dict):
-                    # 相对路径
-                    if file_path[0] != self.file_separator:
-                        gf_path = self.root_path + self.current_working_path + file_path
-                    # 绝对路径
-                    else:
-                        gf_path = self.root_path + file_path
-
-                    seek_queue = self.fp2loc(file_path)
-                    if seek_algo == 'FCFS':
-                        self.disk.FCFS(seek_queue)
-                    elif seek_algo == 'SSTF':
-                        self.disk.SSTF(seek_queue)
-                    elif seek_algo == 'SCAN':
-                        self.disk.SCAN(seek_queue)
-                    elif seek_algo == 'C_SCAN':
-                        self.disk.C_SCAN(seek_queue)
-                    elif seek_algo == 'LOOK':
-                        self.disk.LOOK(seek_queue)
-                    elif seek_algo == 'C_LOOK':
-                        self.disk.C_LOOK(seek_queue)
-                    else:
-                        print("get_file: cannot get file '" + basename +
-                              "': '" + seek_algo + "' no such disk seek algorithm")
-                    # 未解决异常! 直接把形参mode丢到open()了.
-                    f = open(gf_path, mode)
-                    # print("get_file success")
-                    return json.load(f)
+                    return self.path_join(file_path)
                 else:
                     print(
                         "get_file: cannot get file'" +
@@ -130,8 +577,115 @@ class FileManager:
                     "get_file: cannot get file'" +
                     basename +
                     "': file not exist")
+        return None
+
+    # 写入blocks(调用者写了nbytes字节): 放入写回缓冲并装入块缓存, 达到阈值时写回
+    def _write_blocks(self, blocks, nbytes):
+        blocks = list(blocks)
+        self.write_buffer.write(blocks, nbytes)
+        if self.block_cache is not None:
+            self.block_cache.prefetch(self._block_addrs(blocks))
+        if self.write_buffer.due():
+            self.sync()
+
+    # 把写回缓冲中的脏块全部写回磁盘, 返回写回的块数; image后端同时写回有修改的元数据
+    def sync(self):
+        if self.image is not None and self.meta_dirty:
+            self._save_metadata()
+        blocks, runs = self.write_buffer.take()
+        if not blocks:
+            return 0
+        start_time, start_byte = self.disk.total_time, self.disk.total_byte
+        self.disk.access(self._block_addrs(blocks), self.disk.seek_algo, write=True)
+        self.write_buffer.record_flush(runs, self.disk.total_byte - start_byte, self.disk.total_time - start_time)
+        return len(blocks)
+
+    # 按需读取blocks, 顺序读时附带预读其后的块
+    def _read_blocks(self, blocks, seek_algo):
+        if self.write_buffer.due():
+            self.sync()
+        if self.write_buffer.dirty:  # 脏块直接从写回缓冲中读
+            blocks = blocks[~np.isin(blocks, list(self.write_buffer.dirty))]
+        prefetch = []
+        if self.read_ahead is not None and len(blocks):
+            prefetch = self.read_ahead.plan(blocks, self.block_table.owner)
+        return self._access_disk(self._block_addrs(blocks), seek_algo, prefetch)
+
+    # 调度线程运行时把块交给全局请求队列并等待完成(此时使用调度线程的算法, seek_algo只用于检查), 否则直接按seek_algo访问
+    # seek_algo不存在时两种情况都返回False, 不访问块缓存与磁盘
+    # prefetch为预读的块号, 其中已在块缓存中的块不再读, 只有真正读入的块记入预读统计
+    def _access_disk(self, seek_queue, seek_algo, prefetch=()):
+        if seek_algo not in self.disk.seek_algos:
+            return False
+        if self.block_cache is not None:
+            seek_queue = self.block_cache.filter(seek_queue)
+            if len(prefetch):
+                block_of = dict(zip(self._block_addrs(prefetch), prefetch))
+                loaded = self.block_cache.prefetch(list(block_of))
+                self.read_ahead.issue([block_of[seek_addr] for seek_addr in loaded], seek_algo)
+                seek_queue += loaded
+            if not seek_queue:  # 全部命中, 不用访问磁盘
+                return True
+        if self.disk.dispatching:
+            self.disk.submit(seek_queue).result()
+            return True
+        return self.disk.access(seek_queue, seek_algo)
+
+    # 从缓存或磁盘取得解析后的文件, 缓存未命中时由reader读取
+    def _cached_file(self, fp, reader):
+        stamp = self.file_stamp.get(fp, 0)
+        file = self.exec_cache.get(fp, stamp)
+        if file is None:
+            file = reader(fp)
+            self.exec_cache.put(fp, stamp, file)
+        return file
 
-        return False
+    def get_file(self, file_path, mode='r', seek_algo='FCFS'):
+        # 由于open()能完成绝大多数工作, 该函数的主要功能体现在排除异常:
+        fp = self._resolve_file(file_path)
+        if fp is None:
+            return False
+        if not self._read_blocks(self.file_blocks(fp), seek_algo):
+            print("get_file: cannot get file '" + self.path_split(fp)[1] +
+                  "': '" + seek_algo + "' no such disk seek algorithm")
+        # print("get_file success")
+        return self._cached_file(fp, lambda path: self._read_file(path, self.root_path + path, mode))
+
+    # 同时读取多个文件: 所有文件的块合并为一个队列, 按seek_algo只调度一次磁盘,
+    # 缓存未命中的文件在线程池中并发读取与解析. 返回与file_paths一一对应的列表, 失败的位置为False
+    def get_files(self, file_paths, mode='r', seek_algo='FCFS', max_workers=8):
+        fps = [self._resolve_file(file_path) for file_path in file_paths]
+        found = [fp for fp in fps if fp is not None]
+        if not found:
+            return [False] * len(fps)
+        # 同一文件只读一次
+        blocks = np.concatenate([self.file_blocks(fp) for fp in dict.fromkeys(found)])
+        if not self._read_blocks(blocks, seek_algo):
+            print("get_file: cannot get files: '" + seek_algo + "' no such disk seek algorithm")
+        stamps = {fp: self.file_stamp.get(fp, 0) for fp in dict.fromkeys(found)}
+        files = {fp: self.exec_cache.get(fp, stamp) for fp, stamp in stamps.items()}
+        missing = [fp for fp, file in files.items() if file is None]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+                loaded = pool.map(lambda path: self._read_file(path, self.root_path + path, mode), missing)
+                for fp, file in zip(missing, loaded):
+                    files[fp] = file
+                    self.exec_cache.put(fp, stamps[fp], file)
+        return [files[fp] if fp is not None else False for fp in fps]
+
+    # 读取并解析文件内容, 返回的字典会被缓存共享, 调用者不应修改它
+    def _read_file(self, fp, gf_path, mode='r'):
+        if self.image is not None:  # 直接解析映射区域中的数据, 不打开任何文件
+            return json.loads(str(self.image.read_file(self.block_dir[fp][0]), 'utf-8'))
+        # 未解决异常! 直接把形参mode丢到open()了.
+        with open(gf_path, mode) as f:
+            return json.load(f)
+
+    # 文件内容或属性改变后调用, 更新修改戳并使缓存失效
+    def _touch_file(self, fp):
+        self.stamp_counter += 1
+        self.file_stamp[fp] = self.stamp_counter
+        self.exec_cache.invalidate(fp)
 
     # 递归地构建文件树
     def _init_file_system_tree(self, now_path):  # now_path是当前递归到的绝对路径
@@ -149,165 +703,438 @@ class FileManager:
                     # print(file_path)
                     data = json.load(f)
                     part_of_tree[file] = data['type']
-                    if self.fill_file_into_blocks(
+                    if self._store_file(
                             data, file_path[len(self.root_path):]) == -1:  # 将此文件的信息存于外存块中
                         # 没有足够的存储空间
                         print("block storage error: No Enough Initial Space")
         return part_of_tree
 
+    # 文件树中所有目录相对root_path的路径, 根目录为''
+    def _dir_paths(self, tree, prefix=''):
+        paths = [prefix]
+        for name, node in tree.items():
+            if isinstance(node, dict):
+                paths.extend(self._dir_paths(node, prefix + self.file_separator + name))
+        return paths
+
+    # 可持久化的元数据: 文件树, block_dir与空闲区段(即bitmap)
+    def _dump_metadata(self):
+        return {
+            'tree': self.file_system_tree,
+            'block_dir': self.block_dir,
+            'free_extents': self.free_extents.extents()}
+
+    def _load_metadata(self, metadata):
+        self.file_system_tree = metadata['tree']
+        self.dentry_cache.clear()
+        self.block_dir = {fp: ([tuple(extent) for extent in extents], size)
+                          for fp, (extents, size) in metadata['block_dir'].items()}
+        self.bitmap = np.zeros(self.block_number, dtype=np.uint8)
+        for start, length in metadata['free_extents']:
+            self.bitmap[start:start + length] = 1
+        self.free_extents.build(self.bitmap)
+        for fp, (extents, size) in self.block_dir.items():
+            self._assign_blocks(fp, extents, size)
+
+    # 读取元数据清单, 成功返回True; 清单缺失, 磁盘参数不符, 或任一目录的修改时间,
+    # 任一文件的 (修改时间, 大小) 与清单不符(被外部修改)时返回False
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        # 读取后即删除, 若本次运行没有正常卸载, 下次挂载时会重新扫描
+        os.remove(self.manifest_path)
+        if manifest.get('version') != self.manifest_version or \
+                manifest.get('geometry') != [self.block_size, self.tracks, self.secs]:
+            return False
+        for dir_path, mtime in manifest['dir_mtime'].items():
+            try:
+                if os.stat(self.root_path + dir_path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        # 原地修改文件内容不会改变目录的修改时间, 需逐个比较文件的stat
+        if 'file_stat' not in manifest or manifest['file_stat'].keys() != manifest['block_dir'].keys():
+            return False
+        for fp, (mtime, size) in manifest['file_stat'].items():
+            try:
+                stat = os.stat(self.root_path + fp)
+            except OSError:
+                return False
+            if stat.st_mtime_ns != mtime or stat.st_size != size:
+                return False
+        self._load_metadata(manifest)
+        return True
+
+    # 保存元数据清单, 在正常卸载(exit)时调用
+    def save_manifest(self):
+        manifest = self._dump_metadata()
+        manifest['version'] = self.manifest_version
+        manifest['geometry'] = [self.block_size, self.tracks, self.secs]
+        manifest['dir_mtime'] = {dir_path: os.stat(self.root_path + dir_path).st_mtime_ns
+                                 for dir_path in self._dir_paths(self.file_system_tree)}
+        manifest['file_stat'] = {}
+        for fp in self.block_dir:
+            stat = os.stat(self.root_path + fp)
+            manifest['file_stat'][fp] = [stat.st_mtime_ns, stat.st_size]
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _image_metadata(self):
+        metadata = self._dump_metadata()
+        metadata['version'] = self.manifest_version
+        metadata['geometry'] = [self.block_size, self.tracks, self.secs]
+        return metadata
+
+    # 元数据修改后调用: 只标记为脏, image后端在sync(写回缓冲到期或卸载)时写回元数据区, host后端在卸载时统一保存清单
+    def _metadata_changed(self):
+        self.meta_dirty = True
+
+    # 把image后端的元数据写回元数据区, 超出元数据区时溢出到新分配的数据块中; 磁盘也没有空间时报错并返回False
+    def _save_metadata(self):
+        old_spill = self.meta_spill
+        for start, length in old_spill:  # 上次的溢出块先视为空闲, 元数据中不再记录它们
+            self._release_blocks(start, length)
+        if self.image.save_meta(self._image_metadata()):
+            self.meta_spill = []
+            self.meta_dirty = False
+            return True
+        # 新的溢出块必须避开旧的, 元数据区在写完新数据前仍指向旧溢出块
+        for start, length in old_spill:
+            self._occupy_blocks(start, length)
+        num = len(json.dumps(self._image_metadata())) // self.block_size + 2
+        while True:
+            extents = self.find_free_extents(num)
+            if extents == -1:
+                print("disk image error: metadata region is full and no space left to spill")
+                return False
+            for start, length in extents:
+                self._occupy_blocks(start, length)
+            for start, length in old_spill:
+                self._release_blocks(start, length)
+            data = json.dumps(self._image_metadata()).encode('utf-8')
+            if self.image.stored_size(data) <= num * self.block_size:
+                break
+            # 分配溢出块改变了空闲区段, 元数据变长, 重新分配
+            for start, length in old_spill:
+                self._occupy_blocks(start, length)
+            for start, length in extents:
+                self._release_blocks(start, length)
+            num = self.image.stored_size(data) // self.block_size + 2
+        self.image.write_file(extents, data)
+        self.image.save_meta({'version': self.manifest_version,
+                              'geometry': [self.block_size, self.tracks, self.secs], 'spill': extents})
+        self.meta_spill = extents
+        self.meta_dirty = False
+        return True
+
+    def unmount(self):
+        self.sync()
+        self.disk.stop_dispatcher()
+        if self.image is not None:
+            self.image.close()
+            self.image = None
+        else:
+            self.save_manifest()
+
+    # 相对路径转为规范化的绝对路径, 即block_dir的键
+    def path_join(self, file_path):
+        return self._normalize_path(file_path)
+
+    # 为文件分配块, image后端同时把文件数据写入这些块; 空间不足时返回-1
+    def _store_file(self, f, fp, method=0):
+        if self.image is None:
+            return self.fill_file_into_blocks(f, fp, method)
+        data = json.dumps(f).encode('utf-8')
+        # image后端按实际存放的字节数分配
+        size = max(int(f['size']), self.image.stored_size(data))
+        if self.fill_file_into_blocks({'size': size}, fp, method) == -1:
+            return -1
+        self.image.write_file(self.block_dir[fp][0], data)
+        return 0
+
+    # 以下三个函数在image后端中只模拟宿主文件系统的报错, 不操作宿主文件
+    def _host_makedirs(self, path):
+        if self.image is None:
+            os.makedirs(path)
+
+    def _host_rmdir(self, path, node):
+        if self.image is None:
+            os.rmdir(path)
+        elif not isinstance(node, dict):
+            raise NotADirectoryError(path)
+        elif node:
+            raise OSError('Directory not empty: ' + path)
+
+    def _host_remove(self, path):
+        if self.image is None:
+            os.remove(path)
+
     def cal_loc(self, block_num):  # 计算每个文件块所绑定的位置
         track = int(block_num / self.secs)
         sec = block_num % self.secs
         return track, sec
 
-    def fp2loc(self, fp):  # 输入fp，得到其位置list
+    # 以numpy数组返回区段列表中按顺序排列的块号
+    def extent_blocks(self, extents):
+        return np.concatenate([np.arange(start, start + length) for start, length in extents])
+
+    # 文件fp按文件内顺序占用的块号
+    def file_blocks(self, fp):
+        return self.extent_blocks(self.block_dir[fp][0])
+
+    def fp2loc(self, fp):  # 输入fp，得到其位置list, 按区段顺序排列
         # 当fp为相对路径时, 转成绝对路径
-        if fp[0] != self.file_separator:
-            fp = self.current_working_path + fp
-        start, length, size = self.block_dir[fp]
-        loc_list = []
-        for i in range(start, start + length):
-            loc_list.append(self.all_blocks[i].get_loc())
-        return loc_list
+        blocks = self.file_blocks(self.path_join(fp))
+        # 多块磁盘时位置为(磁盘号, 磁道号, 扇区号)
+        if isinstance(self.disk, DiskVolume):
+            return self.disk.locate(blocks)
+        return self._block_addrs(blocks)
 
-    def bitmap2str(self, bm):  # 将ndarray类型的bitmap转换为string
-        return "".join([str(int(x)) for x in list(bm)])
+    # 块号 -> (磁道号, 扇区号)
+    def _block_addrs(self, blocks):
+        return list(zip(self.block_table.track[blocks].tolist(),
+                        self.block_table.sector[blocks].tolist()))
 
     def _init_blocks(self):  # 初始化文件块
-        blocks = []  # 块序列
-        for i in range(self.block_number):  # 新分配blocks
-            b = Block(self.block_size, self.cal_loc(i))
-            blocks.append(b)
-        self.bitmap = np.ones(self.block_number)  # 初始化bitmap
+        blocks = BlockTable(self.block_number, self.block_size, self.secs)  # 块表
+        self.bitmap = np.ones(self.block_number, dtype=np.uint8)  # 初始化bitmap
+        self.free_extents = FreeExtentMap(self.block_number)  # 与bitmap同步的空闲区段索引
+        self.free_extents.build(self.bitmap)
         return blocks
 
-    def block_first_fit(self, goal_str):  # first fit文件填充算法，goal_str指需要的连续块（bitmap形式）的字串
-        bitmap_str = self.bitmap2str(self.bitmap)
-        first_free_block = bitmap_str.find(goal_str)
-        return first_free_block
-
-    def block_best_fit(self, goal_str):  # best fit文件填充算法
-        count = 0
-        free_blocks = []
-        for i in range(len(self.bitmap)):  # 先遍历出所有free的blocks
-            bit = self.bitmap[i]
-            if bit == 0:
-                count = 0
-                continue
-            else:
-                if count == 0:
-                    free_blocks.append([i, 0])
-                count += 1
-                free_blocks[-1][1] = count
-        free_blocks = sorted(free_blocks, key=lambda k: k[1], reverse=False)
-        for i in free_blocks:
-            if i[1] >= len(goal_str):
-                return i[0]
-
-    def block_worst_fit(self, goal_str):  # worst fit文件填充算法
-        count = 0
-        free_blocks = []
-        for i in range(len(self.bitmap)):  # 先遍历出所有free的blocks
-            bit = self.bitmap[i]
-            if bit == 0:
-                count = 0
-                continue
-            else:
-                if count == 0:
-                    free_blocks.append([i, 0])
-                count += 1
-                free_blocks[-1][1] = count
-        free_blocks = sorted(free_blocks, key=lambda k: k[1], reverse=True)
-        return free_blocks[0][0]
-
-    # num:需要的blocks数，此函数用于寻找连续的num个free blocks
+    def block_first_fit(self, num):  # first fit文件填充算法，num指需要的连续块数
+        return self.free_extents.first_fit(num)
+
+    def block_best_fit(self, num):  # best fit文件填充算法
+        return self.free_extents.best_fit(num)
+
+    def block_worst_fit(self, num):  # worst fit文件填充算法
+        return self.free_extents.worst_fit(num)
+
+    # num:需要的blocks数，此函数用于寻找连续的num个free blocks, 找不到时返回-1
     def find_free_blocks(self, num, method=0):
-        goal_str = self.bitmap2str(np.ones(num))
         if method == 0:
-            return self.block_first_fit(goal_str)
+            return self.block_first_fit(num)
         elif method == 1:
-            return self.block_best_fit(goal_str)
+            return self.block_best_fit(num)
         elif method == 2:
-            return self.block_worst_fit(goal_str)
+            return self.block_worst_fit(num)
         else:
             print("error: please set a legal free blocks finding method.")
             return -1
 
+    # 为num个块寻找空间, 返回区段列表, 找不到时返回-1
+    # 优先按method寻找连续的num块; 没有足够长的连续空间时, 从最长的空闲区段开始依次选取, 至多max_extents段
+    def find_free_extents(self, num, method=0):
+        first_free_block = self.find_free_blocks(num, method)
+        if first_free_block != -1:
+            return [(first_free_block, num)]
+        if self.free_extents.free_blocks < num:
+            return -1
+        extents = []
+        for length, start in reversed(self.free_extents.by_size[-self.max_extents:]):
+            extents.append((start, min(length, num)))
+            num -= extents[-1][1]
+            if num == 0:
+                return sorted(extents)
+        return -1
+
     def fill_file_into_blocks(self, f, fp, method=0):  # 将此文件的信息存于外存块中
         num = int(int(f["size"]) / self.block_size)
-        occupy = int(f["size"]) % self.block_size
-        first_free_block = self.find_free_blocks(num + 1, method)
-        if first_free_block == -1:  # 没有足够空间存储此文件
+        extents = self.find_free_extents(num + 1, method)
+        if extents == -1:  # 没有足够空间存储此文件
             return -1
-        free = self.block_size - occupy
-        self.block_dir[fp] = (first_free_block, num + 1,
-                              int(f["size"]))  # block分配信息存在dir中
-        count = int(first_free_block)
-        for i in range(num + 1):
-            if i == num:  # 最后一块可能有碎片
-                self.all_blocks[count].set_free_space(free)
-            else:
-                self.all_blocks[count].set_free_space(0)
-            self.bitmap[count] = 0
-            self.all_blocks[count].set_fp(fp)
-            count += 1
+        self.block_dir[fp] = (extents, int(f["size"]))  # block分配信息存在dir中
+        for start, length in extents:
+            self._occupy_blocks(start, length)
+        self._assign_blocks(fp, extents, int(f["size"]))
         return 0
 
+    # 在块表中登记文件fp占用的块及每块的剩余空间
+    def _assign_blocks(self, fp, extents, size):
+        if fp not in self.file_ids:
+            self.file_ids[fp] = self.next_file_id
+            self.file_names[self.next_file_id] = fp
+            self.next_file_id += 1
+        blocks = self.extent_blocks(extents)
+        self.block_table.owner[blocks] = self.file_ids[fp]
+        self.block_table.free_space[blocks] = 0
+        self.block_table.free_space[blocks[-1]] = self.block_size - size % self.block_size  # 最后一块可能有碎片
+
+    def _clear_blocks(self, start, length):
+        self.block_table.free_space[start:start + length] = self.block_size
+        self.block_table.owner[start:start + length] = -1
+
+    # 占用该块的文件路径, 没有文件时返回None
+    def block_owner(self, block_num):
+        return self.file_names.get(int(self.block_table.owner[block_num]))
+
     def delete_file_from_blocks(self, fp):  # 在文件块中删除文件
-        start = self.block_dir[fp][0]
-        length = self.block_dir[fp][1]
-        for i in range(start, start + length):
-            self.all_blocks[i].set_free_space(self.block_size)
-            self.all_blocks[i].set_fp(None)
-            self.bitmap[i] = 1
+        for start, length in self.block_dir[fp][0]:
+            self._clear_blocks(start, length)
+            self._release_blocks(start, length)
         del self.block_dir[fp]
+        del self.file_names[self.file_ids.pop(fp)]
         return
 
-    def tidy_disk(self):  # 整理磁盘碎片
-        block_dir = copy.deepcopy(self.block_dir)
-        self.all_blocks = self._init_blocks()
-        for f in block_dir.items():
-            self.fill_file_into_blocks({"size": f[1][2]}, f[0])
-        print('tidy disk complete')
+    # bitmap与空闲区段索引的修改都经过以下两个函数, 保证二者一致
+    def _occupy_blocks(self, start, length):
+        self.bitmap[start:start + length] = 0
+        self.free_extents.allocate(start, length)
+
+    def _release_blocks(self, start, length):
+        self.bitmap[start:start + length] = 1
+        self.free_extents.release(start, length)
+        self.write_buffer.discard(range(start, start + length))  # 尚未写回的内容不用再写
+        if self.block_cache is not None:  # 块中的旧内容作废
+            self.block_cache.invalidate(zip(self.block_table.track[start:start + length].tolist(),
+                                            self.block_table.sector[start:start + length].tolist()))
+
+    # 将文件fp中从start开始的区段搬到new_start, 新旧位置可以重叠; 搬动后与文件内前后相接的区段合并
+    def _move_extent(self, fp, start, new_start):
+        extents, size = self.block_dir[fp]
+        idx = [extent[0] for extent in extents].index(start)
+        length = extents[idx][1]
+        self._clear_blocks(start, length)
+        self._release_blocks(start, length)
+        self._occupy_blocks(new_start, length)
+        if self.image is not None:
+            self.image.move_blocks(new_start, start, length)
+        # 搬动只写盘, 调用者没有写入数据
+        self._write_blocks(range(new_start, new_start + length), 0)
+        extents = extents[:idx] + [(new_start, length)] + extents[idx + 1:]
+        merged = []
+        for extent in extents:
+            if merged and merged[-1][0] + merged[-1][1] == extent[0]:
+                merged[-1] = (merged[-1][0], merged[-1][1] + extent[1])
+            else:
+                merged.append(extent)
+        self.block_dir[fp] = (merged, size)
+        self._assign_blocks(fp, merged, size)
+
+    # 增量整理磁盘碎片, 每次调用最多搬动约max_blocks个块(至少搬动一个区段), 整理完毕返回True
+    # 从tidy_cursor开始寻找空洞, 把紧跟在空洞后的区段前移填补, 已经连续的区段不会被搬动;
+    # 空洞后是不可移动的保留块时, 跳过该空洞. 每搬动一个区段后block_dir与块表都是一致的.
+    def tidy_disk_step(self, max_blocks=64):
+        moved_blocks = 0
+        while True:
+            starts = self.free_extents.starts
+            idx = bisect_left(starts, self.tidy_cursor)
+            if idx == len(starts):
+                break
+            hole_start = starts[idx]
+            hole_end = hole_start + self.free_extents.length_of[hole_start]
+            if hole_end >= self.block_number:  # 最后一个空洞已在磁盘末尾
+                break
+            fp = self.block_owner(hole_end)
+            if fp is None:  # 保留块, 跳过
+                self.tidy_cursor = hole_end + 1
+                continue
+            length = dict(self.block_dir[fp][0])[hole_end]
+            if moved_blocks > 0 and moved_blocks + length > max_blocks:
+                return False
+            self._move_extent(fp, hole_end, hole_start)
+            moved_blocks += length
+            self.tidy_moved_extents += 1
+            self.tidy_moved_blocks += length
+            self.tidy_cursor = hole_start + length
+        self.tidy_cursor = 0
+        return True
+
+    # command: td [max_blocks]
+    # 不带参数时整理到完毕为止; 带参数时只做一步有限的整理, 再次执行td从上次的位置继续
+    def tidy_disk(self, max_blocks=None):  # 整理磁盘碎片
+        if self.tidy_cursor == 0:
+            self.tidy_moved_extents = 0
+            self.tidy_moved_blocks = 0
+        fragmentation_before = self.free_extents.fragmentation()
+        if max_blocks is None:
+            while not self.tidy_disk_step():
+                pass
+            done = True
+        else:
+            done = self.tidy_disk_step(max_blocks)
+        self._metadata_changed()
+        fragmentation_after = self.free_extents.fragmentation()
+        if done:
+            print('tidy disk complete: moved {} extent(s) / {} block(s), fragmentation {:.2f} -> {:.2f}'.format(
+                self.tidy_moved_extents, self.tidy_moved_blocks, fragmentation_before, fragmentation_after))
+        else:
+            print('tidy disk: {:.0%} scanned, moved {} extent(s) / {} block(s), fragmentation {:.2f} -> {:.2f}, '
+                  'run td again to continue'.format(self.tidy_cursor / self.block_number, self.tidy_moved_extents,
+                                                   self.tidy_moved_blocks, fragmentation_before, fragmentation_after))
+        return done
 
+    # 只记录本函数占用的块, 其他保留块(如image后端的元数据区)不会被free_unfillable_block释放
     def set_unfillable_block(self):
+        self.unfillable_occupied = []
         for i in self.unfillable_block:
-            self.bitmap[i] = 0
+            if self.bitmap[i] == 1:
+                self._occupy_blocks(i, 1)
+                self.unfillable_occupied.append(i)
 
     def free_unfillable_block(self):
-        for i in self.unfillable_block:
-            self.bitmap[i] = 1
+        for i in self.unfillable_occupied:
+            if self.bitmap[i] == 0 and self.block_table.owner[i] == -1:
+                self._release_blocks(i, 1)
+        self.unfillable_occupied = []
+
+    # 将相对或绝对路径规范化为以根目录开头, 不含 . 与 .. 的绝对路径, 结果按 (当前工作目录, 路径) 缓存
+    def _normalize_path(self, path):
+        key = (self.current_working_path, path)
+        normalized = self.path_cache.get(key)
+        if normalized is None:
+            if path == '' or path[0] != self.file_separator:
+                path = self.current_working_path + path
+            dir_list = []
+            for name in path.split(self.file_separator):
+                if name == '' or name == '.':
+                    continue
+                elif name == '..':
+                    if dir_list:
+                        dir_list.pop()
+                else:
+                    dir_list.append(name)
+            normalized = self.file_separator + self.file_separator.join(dir_list)
+            if len(self.path_cache) >= self.path_cache_size:
+                self.path_cache.clear()
+            self.path_cache[key] = normalized
+        return normalized
+
+    # 使path的目录项缓存失效, 在文件树结构改变时调用; tree为True时(删除目录)其下所有路径一并失效
+    def _invalidate_dentry(self, path, tree=False):
+        path = self._normalize_path(path)
+        self.dentry_cache.pop(path, None)
+        if tree:
+            prefix = path.rstrip(self.file_separator) + self.file_separator
+            for key in [key for key in self.dentry_cache if key.startswith(prefix)]:
+                del self.dentry_cache[key]
 
     # 将 "目录的相对或绝对路径" 转化为 当前目录的字典, 用于之后的判断 文件存在 / 文件类型 几乎所有函数的第一句都是它
+    # 解析结果按规范化的绝对路径缓存在dentry_cache中, 只有路径不存在时才会重新从根目录查找
     def path2dict(self, dir_path):
-        if dir_path == '' or dir_path[0] != self.file_separator:
-            dir_path = self.current_working_path + dir_path
-
-        dir_list = dir_path.split(self.file_separator)
-        dir_list = [i for i in dir_list if i != '']  # 去除由\分割出的空值
+        normalized = self._normalize_path(dir_path)
+        dir_dict = self.dentry_cache.get(normalized)
+        if dir_dict is not None:
+            return dir_dict
         dir_dict = self.file_system_tree
         try:
-            upper_dir_dict_stack = []
-            upper_dir_dict_stack.append(dir_dict)
-            for i in range(len(dir_list)):
-                if dir_list[i] == ".":
-                    pass
-                elif dir_list[i] == '..':
-                    if upper_dir_dict_stack:
-                        dir_dict = upper_dir_dict_stack.pop()
-                    else:
-                        dir_dict = self.file_system_tree
-                else:
-                    upper_dir_dict_stack.append(dir_dict)
-                    dir_dict = dir_dict[dir_list[i]]
-            if not isinstance(dir_dict, dict):
-                pass
-
-            return dir_dict
+            for name in normalized.split(self.file_separator):
+                if name != '':
+                    dir_dict = dir_dict[name]
         # 出错, 即认为路径与当前文件树不匹配, 后续函数会用它来判断"文件夹"是否存在
-        except KeyError:
+        except (KeyError, TypeError):
             print("path error")
             return -1  # 返回错误值, 便于外层函数判断路径错误
+        if len(self.dentry_cache) >= self.dentry_cache_size:
+            self.dentry_cache.clear()
+        self.dentry_cache[normalized] = dir_dict
+        return dir_dict
 
     # 将 "路径" 分割为 该文件所在的目录 和 该文件名, 以元组返回
     def path_split(self, path):
@@ -417,37 +1244,11 @@ class FileManager:
                 try:
                     if basename == "." or basename == ".." or isinstance(
                             current_working_dict[basename], dict):
-                        # 相对路径
-                        if dir_path[0] != self.file_separator:
-                            # 警告! 未解决异常: 当路径以数个\结尾时, \不会被无视.
-                            path_with_point = self.current_working_path + dir_path + self.file_separator
-                        # 绝对路径
-                        else:
-                            path_with_point = dir_path + self.file_separator
-                        # 消除..和.
-                        dir_list = path_with_point.split(self.file_separator)
-                        dir_list = [
-                            i for i in dir_list if i != '']  # 去除由\分割出的空值
-                        ptr = 0  # dir_list指针
-                        while ptr < len(dir_list):
-                            # .即自身
-                            if dir_list[ptr] == '.':
-                                dir_list.pop(ptr)
-                            # ..表示返回上级
-                            elif dir_list[ptr] == '..':
-                                if ptr > 0:
-                                    dir_list.pop(ptr)
-                                    dir_list.pop(ptr - 1)
-                                    ptr = ptr - 1
-                                # 当已经到根目录时
-                                else:
-                                    dir_list.pop(ptr)
-                            else:
-                                ptr = ptr + 1
-                        # 组合current_working_path
-                        self.current_working_path = '\\'
-                        for i in dir_list:
-                            self.current_working_path += i + '\\'
+                        # 消除..和., 组合current_working_path
+                        normalized = self._normalize_path(dir_path)
+                        if normalized != self.file_separator:
+                            normalized += self.file_separator
+                        self.current_working_path = normalized
                     # 异常1 文件存在但不是目录
                     else:
                         print('cd: error ' + basename + ': Not a dir')
@@ -476,8 +1277,10 @@ class FileManager:
                 # 绝对路径
                 else:
                     mkdir_path = self.root_path + dir_path
-                os.makedirs(mkdir_path)
+                self._host_makedirs(mkdir_path)
                 current_working_dict[basename] = {}
+                self._invalidate_dentry(dir_path)
+                self._metadata_changed()
                 print("mkdir success")
 
     # command: make file
@@ -502,30 +1305,127 @@ class FileManager:
         else:
             # 文件名是否已存在
             if basename not in current_working_dict:
-                # 相对路径 先不与self.root_path相拼接, 为了紧接着的fill_file_into_blocks传参
-                if file_path[0] != self.file_separator:
-                    mkf_path = self.current_working_path + file_path
-                # 绝对路径
-                else:
-                    mkf_path = file_path
-                if self.fill_file_into_blocks(
+                # 先不与self.root_path相拼接, 为了紧接着的fill_file_into_blocks传参
+                mkf_path = self.path_join(file_path)
+                if self._store_file(
                         json_text, mkf_path, method=2) == -1:  # 测试是否能装入block
                     print(
                         "mkf: cannot create file'" +
                         basename +
                         "': No enough Space")
                     return
-                mkf_path = self.root_path + mkf_path
-                f = open(mkf_path, 'w')
-                f.write(json_data)
-                f.close()
+                if self.image is None:
+                    f = open(self.root_path + mkf_path, 'w')
+                    f.write(json_data)
+                    f.close()
                 # 同时修改文件树
                 current_working_dict[basename] = file_type
+                self._invalidate_dentry(mkf_path)
+                self._touch_file(mkf_path)
+                self._write_blocks(self.file_blocks(mkf_path).tolist(), int(size))
+                self._metadata_changed()
                 print("mkf success")
             # 异常2 文件已存在
             else:
                 print("mkf: cannot create file'" + basename + "': file exists")
 
+    # 批量创建文件, entries中每项为 (file_path, file_type, size) 或 (file_path, file_type, size, content)
+    # 每个目录只解析一次路径, 所有文件在一次分配中取得空间(没有足够长的连续空间时才逐个分配),
+    # 文件树, 宿主文件与元数据一并修改, 最后只输出一行结果. 返回成功创建的文件数
+    def mkf_batch(self, entries, method=2):
+        plans = []  # (fp, 所在目录的字典, 文件名, 文件内容, 分配的大小, image后端中写入的数据)
+        planned = set()
+        for entry in entries:
+            file_path, file_type, size = entry[:3]
+            content = entry[3] if len(entry) > 3 else None
+            if file_type[0] != 'c':
+                print("mkf: cannot create file'" + file_path + "': only common file can be created")
+                continue
+            fp = self.path_join(file_path)
+            (upper_path, basename) = self.path_split(fp)
+            current_working_dict = self.path2dict(upper_path)
+            if current_working_dict == -1:
+                continue
+            if not isinstance(current_working_dict, dict) or basename in current_working_dict or fp in planned:
+                print("mkf: cannot create file'" + basename + "': file exists")
+                continue
+            planned.add(fp)
+            json_text = {'name': file_path, 'type': file_type, 'size': size, 'content': [content]}
+            data = None
+            alloc_size = int(size)
+            if self.image is not None:
+                data = json.dumps(json_text).encode('utf-8')
+                alloc_size = max(alloc_size, self.image.stored_size(data))
+            plans.append((fp, current_working_dict, basename, json_text, alloc_size, data))
+
+        # 一次分配: 先尝试为全部文件取一段连续空间, 再依次切分给每个文件
+        counts = [alloc_size // self.block_size + 1 for (_, _, _, _, alloc_size, _) in plans]
+        start = self.find_free_blocks(sum(counts), method) if plans else -1
+        if start != -1:
+            self._occupy_blocks(start, sum(counts))
+        created = 0
+        for (fp, current_working_dict, basename, json_text, alloc_size, data), count in zip(plans, counts):
+            if start != -1:
+                extents = [(start, count)]
+                start += count
+            else:
+                extents = self.find_free_extents(count, method)
+                if extents == -1:
+                    print("mkf: cannot create file'" + basename + "': No enough Space")
+                    continue
+                for extent in extents:
+                    self._occupy_blocks(*extent)
+            self.block_dir[fp] = (extents, alloc_size)
+            self._assign_blocks(fp, extents, alloc_size)
+            if self.image is not None:
+                self.image.write_file(extents, data)
+            else:
+                with open(self.root_path + fp, 'w') as f:
+                    f.write(json.dumps(json_text, indent=4))
+            current_working_dict[basename] = json_text['type']
+            self._invalidate_dentry(fp)
+            self._touch_file(fp)
+            self._write_blocks(self.extent_blocks(extents).tolist(), int(json_text['size']))
+            created += 1
+        self._metadata_changed()
+        print("mkf: %d file(s) created" % created)
+        return created
+
+    # 删除整个目录树: 路径只解析一次, 子树中所有文件的块一并释放, 宿主目录一次删除
+    # 返回删除的文件数, 失败时报错并返回-1
+    def rm_tree(self, dir_path):
+        (upper_path, basename) = self.path_split(dir_path)
+        current_working_dict = self.path2dict(upper_path)
+        if current_working_dict == -1:
+            return -1
+        if not isinstance(current_working_dict, dict) or basename not in current_working_dict:
+            print("rm -r: cannot remove '" + basename + "': No such directory")
+            return -1
+        if not isinstance(current_working_dict[basename], dict):
+            print("rm -r: cannot remove '" + basename + "': not a dir")
+            return -1
+        tree_path = self.path_join(dir_path)
+        files = []
+        stack = [(tree_path, current_working_dict[basename])]
+        while stack:
+            path, dir_dict = stack.pop()
+            for name, node in dir_dict.items():
+                if isinstance(node, dict):
+                    stack.append((path + self.file_separator + name, node))
+                else:
+                    files.append(path + self.file_separator + name)
+        for fp in files:
+            if fp in self.block_dir:
+                self.delete_file_from_blocks(fp)
+            self.file_stamp.pop(fp, None)
+            self.exec_cache.invalidate(fp)
+        if self.image is None:
+            shutil.rmtree(self.root_path + tree_path)
+        current_working_dict.pop(basename)
+        self._invalidate_dentry(tree_path, tree=True)
+        self._metadata_changed()
+        return len(files)
+
     # command: rm name
     def rm(self, file_path, mode=''):
         (upper_path, basename) = self.path_split(file_path)
@@ -545,35 +1445,17 @@ class FileManager:
                         # 绝对路径
                         else:
                             rmdir_path = self.root_path + file_path
-                        # -rf: 递归地强制删除文件夹
+                        # -rf: 强制删除整个目录树
                         if len(mode) == 3 and mode[2] == 'f':
-                            sub_dir_dict = self.path2dict(file_path)
-                            for i in copy.deepcopy(
-                                    copy.deepcopy(list(sub_dir_dict.keys()))):  # 删除此目录下的每个文件
-                                sub_file_path = file_path + '\\' + i
-                                real_sub_file_path = rmdir_path + '\\' + i
-                                # 非空的目录, 需要递归删除
-                                # print(sub_dir_dict[i])
-                                # print(type(sub_dir_dict[i]))
-                                # print(isinstance(sub_dir_dict[i], str))
-                                if isinstance(
-                                        sub_dir_dict[i], dict) and sub_dir_dict[i]:
-                                    self.rm(sub_file_path, '-rf')
-                                # 空目录, 直接删除
-                                elif isinstance(sub_dir_dict[i], dict) and not sub_dir_dict[i]:
-                                    os.rmdir(real_sub_file_path)
-                                # 是文件, 强制删除
-                                elif isinstance(sub_dir_dict[i], str):
-                                    self.rm(sub_file_path, '-f')
-
-                            os.rmdir(rmdir_path)
-                            current_working_dict.pop(basename)
+                            self.rm_tree(file_path)
 
                         # -r: 仅删除空文件夹
                         else:
                             # 同时修改文件树
-                            os.rmdir(rmdir_path)
+                            self._host_rmdir(rmdir_path, current_working_dict[basename])
                             current_working_dict.pop(basename)
+                            self._invalidate_dentry(file_path, tree=True)
+                            self._metadata_changed()
 
                     else:
                         print(
@@ -593,20 +1475,19 @@ class FileManager:
             elif mode == '' or mode == '-f':
                 try:
                     if basename in current_working_dict:
-                        # 相对路径
-                        if file_path[0] != self.file_separator:
-                            rm_path = self.current_working_path + file_path
-                        # 绝对路径
-                        else:
-                            rm_path = file_path
+                        rm_path = self.path_join(file_path)
                         if current_working_dict[basename][2] == 'w' or mode == '-f':
                             # 在block中删除文件
                             self.delete_file_from_blocks(rm_path)
+                            self.file_stamp.pop(rm_path, None)
+                            self.exec_cache.invalidate(rm_path)
                             rm_path = self.root_path + rm_path
                             # 删真正文件
-                            os.remove(rm_path)
+                            self._host_remove(rm_path)
                             # 同时修改文件树
                             current_working_dict.pop(basename)
+                            self._invalidate_dentry(file_path)
+                            self._metadata_changed()
                         # 异常1 文件只读, 不可删除
                         else:
                             print(
@@ -644,14 +1525,26 @@ class FileManager:
                     # 绝对路径
                     else:
                         chmod_path = self.root_path + file_path
-                    f_in = open(chmod_path, 'r')
-                    json_data = json.load(f_in)
-                    json_data["type"] = file_type
-                    f_out = open(chmod_path, 'w')
-                    f_out.write(json.dumps(json_data, indent=4))
-                    f_in.close()
-                    f_out.close()
+                    if self.image is not None:
+                        extents = self.block_dir[self.path_join(file_path)][0]
+                        json_data = json.loads(str(self.image.read_file(extents), 'utf-8'))
+                        json_data["type"] = file_type
+                        self.image.write_file(extents, json.dumps(json_data).encode('utf-8'))
+                    else:
+                        f_in = open(chmod_path, 'r')
+                        json_data = json.load(f_in)
+                        json_data["type"] = file_type
+                        f_out = open(chmod_path, 'w')
+                        f_out.write(json.dumps(json_data, indent=4))
+                        f_in.close()
+                        f_out.close()
                     current_working_dict[basename] = file_type
+                    self._invalidate_dentry(file_path)
+                    self._touch_file(self.path_join(file_path))
+                    # 整个文件被重写
+                    extents, size = self.block_dir[self.path_join(file_path)]
+                    self._write_blocks(self.extent_blocks(extents).tolist(), size)
+                    self._metadata_changed()
                     print("chmod success")
                 # 异常1 文件是目录
                 else:
@@ -690,7 +1583,7 @@ class FileManager:
     # print status of all blocks
     def display_storage_status(self):
         total = self.block_size * self.block_number  # 总字节数
-        all_free = len(np.nonzero(self.bitmap)[0])
+        all_free = int(np.count_nonzero(self.bitmap))
         all_free *= self.block_size  # 剩余的总字节数
         all_occupy = total - all_free  # 已占用的总字节数
         print(
@@ -698,15 +1591,24 @@ class FileManager:
                 total,
                 all_occupy,
                 all_free))
+        print("free extents: {},\t largest: {} block(s),\t fragmentation: {:.2f},\t fragmented files: {}".format(
+            len(self.free_extents.starts), self.free_extents.largest(), self.free_extents.fragmentation(),
+            sum(len(extents) > 1 for extents, size in self.block_dir.values())))
+        print("exec cache: {} hit(s), {} miss(es), {} / {} file(s) cached\n".format(
+            self.exec_cache.hits, self.exec_cache.misses, len(self.exec_cache.entries), self.exec_cache.capacity))
+        if self.block_cache is not None:
+            print(self.block_cache.status() + "\n")
+        if self.read_ahead is not None:
+            print(self.read_ahead.status() + "\n")
+        print(self.write_buffer.status() + "\n")
+        if self.disk.latency_histograms():
+            print("disk latency:\n" + self.disk.latency_status() + "\n")
         # for fp, item in self.block_dir.items():  # 调试用
         #     print("{:<10}: start {}\t length {}".format(fp, item[0], item[1]))
-        for i in range(self.block_number):
-            b = self.all_blocks[i]
-            occupy = self.block_size - b.get_free_space()
-            if occupy > 0:
-                # all_free += b.get_free_space()
-                print("block #{:<5} {:>5} / {} Byte(s)   {:<20}".format(i,
-                                                                        occupy, self.block_size, str(b.get_fp())))
+        occupy = self.block_size - self.block_table.free_space
+        for i in np.nonzero(occupy > 0)[0].tolist():
+            print("block #{:<5} {:>5} / {} Byte(s)   {:<20}".format(i,
+                                                                    occupy[i], self.block_size, str(self.block_owner(i))))
 
     # nowheadpointer 某次访存开始时磁头所在磁道号.
     def set_disk_now_headpointer(self, now_headpointer=0):
@@ -717,12 +1619,59 @@ class FileManager:
 
     # 画出过去所有读写磁盘操作时的平均速度柱状图
     def draw_disk_speed(self):
-        self.disk.draw_disk_speed()
+        title = None
+        if self.block_cache is not None:
+            title = "block cache ({}): hit ratio {:.1%}, {} eviction(s), {} KB saved".format(
+                self.block_cache.policy_name, self.block_cache.hit_ratio(), self.block_cache.evictions,
+                self.block_cache.bytes_saved() // 1024)
+        self.disk.draw_disk_speed(title)
+        self.disk.draw_latency()
+
+
+class LatencyHistogram:
+    ''' 对数分桶的延迟直方图(单位:S): 1us到1e6s每十倍20个桶, 另有不足1us与超过1e6s两个桶.
+        百分位数取其所在桶的上界, 相对误差不超过约12%; 落在超过1e6s的桶时取最大值. '''
+    edges = np.logspace(-6, 6, 241)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.total = 0
+        self.max = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        self.counts += np.bincount(np.searchsorted(self.edges, values), minlength=len(self.counts))
+        self.total += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def count(self):
+        return int(self.counts.sum())
+
+    def mean(self):
+        return self.total / self.count() if self.count() else 0
+
+    def percentile(self, q):
+        n = self.count()
+        if not n:
+            return 0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q / 100 * n))
+        if bucket >= len(self.edges):  # 超出最大的桶边界, 没有上界可用
+            return self.max
+        return min(float(self.edges[bucket]), self.max)
 
 
 class Disk:
+    seek_algos = ('FCFS', 'SSTF', 'SCAN', 'C_SCAN', 'LOOK', 'C_LOOK', 'SATF', 'DEADLINE')
+
     def __init__(self, block_size, track_num, sec_num,
-                 now_headpointer=53, x_slow=10):
+                 now_headpointer=53, x_slow=10, virtual_clock=False, seek_algo='FCFS', rotational=False):
         # 扇区大小 默认512byte
         self.sector_size = block_size
         # 每磁道中扇区数 默认12
@@ -740,6 +1689,24 @@ class Disk:
         self.x_slow = x_slow
         self.seek_speed = self.seek_speed * x_slow
         self.rotate_speed = self.rotate_speed * x_slow
+        # 虚拟时钟模式: 不调用time.sleep(), 只计算延迟并推进self.clock(单位:S, 不含减速比)
+        self.virtual_clock = virtual_clock
+        self.clock = 0
+        # 旋转模型: 按self.clock跟踪盘片的角位置, 旋转延迟取决于目标扇区, 而不是固定的rotate_speed
+        self.rotational = rotational
+        # 截止时间调度: 请求从到达起最多等read_expire秒. 例外: 写回(sync, 包括tidy_disk搬动的块)直接调用access,
+        # 不经过请求队列与截止时间, 它们的排队延迟只含同一批写回中排在前面的请求
+        self.read_expire = 0.5
+        # 寻道算法 -> (排队延迟直方图, 服务延迟直方图), 单位:S
+        self.latency = {}
+        # 全局请求队列: 多个调用者submit()的请求由调度线程合并, 按seek_algo排序后统一访问
+        self.seek_algo = seek_algo
+        self.pending_requests = []
+        self.request_condition = threading.Condition()
+        self.dispatcher = None
+        self.dispatching = False
+        # 访问磁盘(移动磁头, 记录统计)时持有, 调度线程与直接调用的算法互斥
+        self.service_lock = threading.Lock()
 
         # 以下变量用于画图
         # 总读写时间(单位:S)
@@ -753,6 +1720,8 @@ class Disk:
 
         # 2020.6.12 陈斌添加：为True则会输出图片到本地
         self.disk_monitoring = False
+        # 为False时不打印每次访问的耗时(如卷中的各块磁盘)
+        self.verbose = True
 
     # 提供两个可修改参数,
     # nowheadpointer 某次访存开始时磁头所在磁道号.
@@ -766,8 +1735,26 @@ class Disk:
         self.seek_speed = self.seek_speed * x_slow
         self.rotate_speed = self.rotate_speed * x_slow
 
+    # 切换虚拟时钟模式, 统计数据(total_time, speed_list等)在两种模式下含义相同
+    def set_virtual_clock(self, virtual_clock=True):
+        self.virtual_clock = virtual_clock
+
+    # 按名称选择寻道算法访问seek_queue中的块, 没有该算法时返回False
+    # write为True表示写盘, 单块磁盘上读写的代价相同
+    def access(self, seek_queue, seek_algo='FCFS', write=False):
+        if seek_algo not in self.seek_algos:
+            return False
+        getattr(self, seek_algo)(seek_queue)
+        return True
+
     # 朴实无华地按照queue一个个访问磁盘
     def seek_by_queue(self, seek_queue):
+        if self.virtual_clock or self.rotational:
+            this_time_time, this_time_byte = self._simulate_queue(seek_queue)
+            if not self.virtual_clock:  # 模拟延迟(考虑减速比)
+                time.sleep(this_time_time * self.x_slow)
+            self._record_access(this_time_time, this_time_byte)
+            return
         # 本次访存的耗时与读写量
         this_time_time = 0
         this_time_byte = 0
@@ -794,133 +1781,394 @@ class Disk:
                 this_time_time = this_time_time + self.rotate_speed / self.x_slow
             # 记录读写量
             this_time_byte = this_time_byte + self.sector_size
+        # print(total_track_distance)
+        self.clock = self.clock + this_time_time
+        self._record_access(this_time_time, this_time_byte)
+
+    # 按queue计算寻道与旋转延迟, 移动磁头并推进时钟, 返回(耗时, 读写量)
+    def _simulate_queue(self, seek_queue):
+        if not seek_queue:
+            return 0, 0
+        distances, times = self.service_times(seek_queue)
+        this_time_time = float(times.sum())
+        self.now_headpointer = seek_queue[-1][0]
+        self.clock = self.clock + this_time_time
+        return this_time_time, len(seek_queue) * self.sector_size
+
+    # 从当前磁头位置按顺序访问seek_queue时, 每一步的寻道距离(磁道数)与耗时(单位:S, 不含减速比), 不移动磁头
+    def service_times(self, seek_queue):
+        addrs = np.array(seek_queue, dtype=np.int64).reshape(-1, 2)
+        distances = np.abs(np.diff(addrs[:, 0], prepend=self.now_headpointer))
+        if not self.rotational:
+            # 扇区为-1时, 只寻道不读写
+            times = (distances * self.seek_speed + (addrs[:, 1] != -1) * self.rotate_speed) / self.x_slow
+            return distances, times
+        # 旋转模型: 等到目标扇区转到磁头下, 再用一个扇区的时间读写
+        sector_time = self.sector_time()
+        seek_times = distances * (self.seek_speed / self.x_slow)
+        times = np.empty(len(addrs))
+        angle = self.angle()
+        for i, (seek_time, sector) in enumerate(zip(seek_times.tolist(), addrs[:, 1].tolist())):
+            angle = (angle + seek_time / sector_time) % self.track_size
+            if sector == -1:
+                times[i] = seek_time
+                continue
+            times[i] = seek_time + ((sector - angle) % self.track_size + 1) * sector_time
+            angle = (sector + 1) % self.track_size
+        return distances, times
+
+    # 旋转一个扇区的时间(单位:S, 不含减速比); rotate_speed是平均旋转延迟, 即半圈的时间
+    def sector_time(self):
+        return 2 * self.rotate_speed / self.x_slow / self.track_size
+
+    # 此刻磁头下的角位置, 单位为扇区, 取值[0, track_size)
+    def angle(self):
+        return (self.clock / self.sector_time()) % self.track_size
+
+    # 记录一次访存的耗时与读写量, 供draw_disk_speed()画图
+    def _record_access(self, this_time_time, this_time_byte):
         self.total_time = self.total_time + this_time_time
         self.total_byte = self.total_byte + this_time_byte
-        print("disk access success: time used: ",
-              round(this_time_time * 1000, 5), "ms")
-        # print(total_track_distance)
-        self.total_speed_list.append(self.total_byte / self.total_time)
-        self.speed_list.append(this_time_byte / this_time_time)
+        if self.verbose:
+            print("disk access success: time used: ",
+                  round(this_time_time * 1000, 5), "ms")
+        # 空队列耗时为0, 速度记为0
+        self.total_speed_list.append(self.total_byte / self.total_time if self.total_time else 0)
+        self.speed_list.append(this_time_byte / this_time_time if this_time_time else 0)
+
+    # 按seek_algo排序后访问磁盘, 并记录算法名供画图;
+    # arrivals为各请求到达的时刻(与seek_queue一一对应), 为None时视为此刻到达
+    def _serve(self, seek_queue, algo, arrivals=None):
+        with self.service_lock:
+            start = self.clock
+            if seek_queue:
+                distances, times = self.service_times(seek_queue)
+            self.seek_by_queue(seek_queue)
+            if seek_queue:
+                self._record_latency(algo, seek_queue, start, times, arrivals)
+            self.algo_list.append(algo)
+            if self.disk_monitoring:
+                self.draw_track(seek_queue, algo)
+
+    # 记录每个请求的服务延迟(自己的寻道, 旋转与读写, 含之前折返点的寻道)与排队延迟(到达至开始服务该请求)
+    def _record_latency(self, algo, seek_queue, start, times, arrivals):
+        real = np.array([seek_addr[1] != -1 for seek_addr in seek_queue])
+        finish = np.cumsum(times)[real]
+        service = np.diff(finish, prepend=0)
+        queueing = finish - service
+        if arrivals is not None:
+            queueing += start - np.array([start if arrival is None else arrival for arrival in arrivals])[real]
+        queue_histogram, service_histogram = self.latency.setdefault(
+            algo, (LatencyHistogram(), LatencyHistogram()))
+        queue_histogram.add(queueing)
+        service_histogram.add(service)
+
+    def latency_histograms(self):
+        return self.latency
+
+    # 各寻道算法的排队与服务延迟的p50/p95/p99
+    def latency_status(self):
+        lines = []
+        for algo, histograms in self.latency_histograms().items():
+            lines.append("{:<8} {} request(s), ".format(algo, histograms[1].count()) + ", ".join(
+                "{} p50 {:.2f} / p95 {:.2f} / p99 {:.2f} ms".format(
+                    name, *(histogram.percentile(q) * 1000 for q in (50, 95, 99)))
+                for name, histogram in zip(('queueing', 'service'), histograms)))
+        return '\n'.join(lines)
+
+    # 只按seek_algo给seek_queue排序(可能插入扇区为-1的折返点), 不访问磁盘;
+    # deadlines为各请求的截止时刻, 只有DEADLINE使用
+    def schedule(self, seek_queue, seek_algo='FCFS', deadlines=None):
+        if seek_algo == 'DEADLINE':
+            return self._order_DEADLINE(seek_queue, deadlines)
+        return getattr(self, '_order_' + seek_algo)(seek_queue)
 
     # 先来先服务
     def FCFS(self, seek_queue):
-        self.seek_by_queue(seek_queue)
-        self.algo_list.append('FCFS')
-        if self.disk_monitoring:
-            self.draw_track(seek_queue, "FCFS")
+        self._serve(self._order_FCFS(seek_queue), 'FCFS')
 
     # 最短寻道时间优先
     def SSTF(self, seek_queue):
-        # 暂存经过SSTF排序后的seek_queue
-        temp_seek_queue = [(self.now_headpointer, 0)]
-        while seek_queue:
-            min_track_distance = self.track_num
-            for seek_addr in seek_queue:
-                temp_now_headpointer = temp_seek_queue[-1][0]
-                track_distance = abs(seek_addr[0] - temp_now_headpointer)
-                if track_distance < min_track_distance:
-                    min_track_distance = track_distance
-                    loc = seek_queue.index(seek_addr)
-            temp_seek_queue.append(seek_queue[loc])
-            seek_queue.pop(loc)
-        temp_seek_queue.pop(0)
-        seek_queue = temp_seek_queue
-
-        self.seek_by_queue(seek_queue)
-        self.algo_list.append('SSTF')
-        if self.disk_monitoring:
-            self.draw_track(seek_queue, "SSTF")
+        self._serve(self._order_SSTF(seek_queue), 'SSTF')
 
     # 先正向扫描,扫到头,再负向扫描
     def SCAN(self, seek_queue):
-        # 暂存经过SCAN方法排序后的seek_queue
-        temp_seek_queue = []
-        seek_queue.sort(key=lambda item: item[0])
-        for loc in range(len(seek_queue)):
-            if seek_queue[loc][0] >= self.now_headpointer:
-                break
-        # 比now_headpointer大的部分,正序访问
-        temp_seek_queue.extend(seek_queue[loc:])
-        # 走到头
-        if temp_seek_queue == seek_queue:
-            pass
-        else:
-            temp_seek_queue.append((self.track_num - 1, -1))
-            # 比now_headpointer小的部分,负序访问
-            temp_seek_queue.extend(seek_queue[loc - 1::-1])
-            seek_queue = temp_seek_queue
-        self.seek_by_queue(seek_queue)
-        self.algo_list.append('SCAN')
-        if self.disk_monitoring:
-            self.draw_track(seek_queue, "SCAN")
+        self._serve(self._order_SCAN(seek_queue), 'SCAN')
 
     # 先正向扫描,扫到头,归0,再正向扫描
     def C_SCAN(self, seek_queue):
-        # 暂存经过C_SCAN方法排序后的seek_queue
-        temp_seek_queue = []
-        seek_queue.sort(key=lambda item: item[0])
-        for loc in range(len(seek_queue)):
-            if seek_queue[loc][0] >= self.now_headpointer:
-                break
-        # 比now_headpointer大的部分,正序访问
-        temp_seek_queue.extend(seek_queue[loc:])
-        # 如果只有比now_headpointer大的部分,就不用回头了
-        if temp_seek_queue == seek_queue:
-            pass
-        else:
-            # 走到头
-            temp_seek_queue.append((self.track_num - 1, -1))
-            # 归零
-            temp_seek_queue.append((0, -1))
-            # 比now_headpointer小的部分,负序访问
-            temp_seek_queue.extend(seek_queue[:loc])
-            seek_queue = temp_seek_queue
-        self.seek_by_queue(seek_queue)
-        self.algo_list.append('C_SCAN')
-        if self.disk_monitoring:
-            self.draw_track(seek_queue, "C_SCAN")
+        self._serve(self._order_C_SCAN(seek_queue), 'C_SCAN')
 
     # 先正向扫描,不扫到头,再负向扫描
     def LOOK(self, seek_queue):
-        # 暂存经过LOOK排序后的seek_queue
-        temp_seek_queue = []
-        seek_queue.sort(key=lambda item: item[0])
-        for loc in range(len(seek_queue)):
-            if seek_queue[loc][0] >= self.now_headpointer:
-                break
-        # 比now_headpointer大的部分,正序访问
-        temp_seek_queue.extend(seek_queue[loc:])
-        if temp_seek_queue == seek_queue:
-            pass
-        else:
-            # 比now_headpointer小的部分,负序访问
-            temp_seek_queue.extend(seek_queue[loc - 1::-1])
-            seek_queue = temp_seek_queue
-
-        self.seek_by_queue(seek_queue)
-        self.algo_list.append('LOOK')
-        if self.disk_monitoring:
-            self.draw_track(seek_queue, "LOOK")
+        self._serve(self._order_LOOK(seek_queue), 'LOOK')
 
     # 先正向扫描,不扫到头,归0,再正向扫描
     def C_LOOK(self, seek_queue):
-        # 暂存经过C_LOOK方法排序后的seek_queue
-        temp_seek_queue = []
-        seek_queue.sort(key=lambda item: item[0])
-        for loc in range(len(seek_queue)):
-            if seek_queue[loc][0] >= self.now_headpointer:
-                break
-        # 比now_headpointer大的部分,正序访问
-        temp_seek_queue.extend(seek_queue[loc:])
-        # 比now_headpointer小的部分,正序访问
-        temp_seek_queue.extend(seek_queue[:loc])
-        seek_queue = temp_seek_queue
-        self.seek_by_queue(seek_queue)
-        self.algo_list.append('C_LOOK')
-        if self.disk_monitoring:
-            self.draw_track(seek_queue, "C_LOOK")
+        self._serve(self._order_C_LOOK(seek_queue), 'C_LOOK')
 
-    def draw_disk_speed(self):
+    # 最短访问时间优先: 同时考虑寻道与旋转延迟
+    def SATF(self, seek_queue):
+        self._serve(self._order_SATF(seek_queue), 'SATF')
+
+    # 截止时间优先: 平时单向扫描, 有请求超过截止时间时先访问它
+    def DEADLINE(self, seek_queue, deadlines=None):
+        self._serve(self._order_DEADLINE(seek_queue, deadlines), 'DEADLINE')
+
+    def _order_FCFS(self, seek_queue):
+        return seek_queue
+
+    # 按磁道号稳定排序, 返回(排序后的队列, 排序后的磁道号数组, 排序下标)
+    def _sort_by_track(self, seek_queue):
+        tracks = np.fromiter(map(itemgetter(0), seek_queue), dtype=np.int64, count=len(seek_queue))
+        # 磁道号放得进int16时, numpy的稳定排序会用基数排序
+        if tracks.min() >= 0 and tracks.max() <= np.iinfo(np.int16).max:
+            order = np.argsort(tracks.astype(np.int16), kind='stable')
+        else:
+            order = np.argsort(tracks, kind='stable')
+        return list(map(seek_queue.__getitem__, order.tolist())), tracks[order], order
+
+    # 排序后第一个磁道号不小于now_headpointer的位置; 都比它小时取最后一个
+    def _sweep_start(self, tracks):
+        loc = int(np.searchsorted(tracks, self.now_headpointer, 'left'))
+        return min(loc, len(tracks) - 1)
+
+    def _order_SSTF(self, seek_queue):
+        if not seek_queue:
+            return []
+        seek_queue, tracks, order = self._sort_by_track(seek_queue)
+        # 同一磁道的请求为一组, 组内保持原顺序, 一旦磁头到达就全部访问;
+        # 两侧距离相同时, 先去组内最早提交的请求更早的那一组
+        starts = [0] + (np.flatnonzero(np.diff(tracks)) + 1).tolist()
+        ends = starts[1:] + [len(seek_queue)]
+        group_tracks = tracks[starts].tolist()
+        first = order[starts].tolist()
+        # 已访问的组总是连续的一段, lo和hi是它两侧最近的未访问组
+        head = self.now_headpointer
+        hi = bisect_left(group_tracks, head)
+        lo = hi - 1
+        temp_seek_queue = []
+        while lo >= 0 or hi < len(group_tracks):
+            if hi == len(group_tracks):
+                go_lower = True
+            elif lo < 0:
+                go_lower = False
+            else:
+                lower_distance = head - group_tracks[lo]
+                upper_distance = group_tracks[hi] - head
+                go_lower = lower_distance < upper_distance or \
+                    (lower_distance == upper_distance and first[lo] < first[hi])
+            if go_lower:
+                group = lo
+                lo -= 1
+            else:
+                group = hi
+                hi += 1
+            temp_seek_queue.extend(seek_queue[starts[group]:ends[group]])
+            head = group_tracks[group]
+        return temp_seek_queue
+
+    def _order_SCAN(self, seek_queue):
+        if not seek_queue:
+            return []
+        seek_queue, tracks, _ = self._sort_by_track(seek_queue)
+        loc = self._sweep_start(tracks)
+        # 比now_headpointer大的部分,正序访问; 没有比它小的部分就不用回头
+        if loc == 0:
+            return seek_queue
+        # 走到头, 再把比now_headpointer小的部分负序访问
+        return seek_queue[loc:] + [(self.track_num - 1, -1)] + seek_queue[loc - 1::-1]
+
+    def _order_C_SCAN(self, seek_queue):
+        if not seek_queue:
+            return []
+        seek_queue, tracks, _ = self._sort_by_track(seek_queue)
+        loc = self._sweep_start(tracks)
+        # 如果只有比now_headpointer大的部分,就不用回头了
+        if loc == 0:
+            return seek_queue
+        # 走到头, 归零, 再把比now_headpointer小的部分正序访问
+        return seek_queue[loc:] + [(self.track_num - 1, -1), (0, -1)] + seek_queue[:loc]
+
+    def _order_LOOK(self, seek_queue):
+        if not seek_queue:
+            return []
+        seek_queue, tracks, _ = self._sort_by_track(seek_queue)
+        loc = self._sweep_start(tracks)
+        if loc == 0:
+            return seek_queue
+        # 比now_headpointer大的部分正序访问, 比它小的部分负序访问
+        return seek_queue[loc:] + seek_queue[loc - 1::-1]
+
+    def _order_C_LOOK(self, seek_queue):
+        if not seek_queue:
+            return []
+        seek_queue, tracks, _ = self._sort_by_track(seek_queue)
+        loc = self._sweep_start(tracks)
+        # 比now_headpointer大的部分,正序访问; 比now_headpointer小的部分,正序访问
+        return seek_queue[loc:] + seek_queue[:loc]
+
+    def _order_SATF(self, seek_queue):
+        if not seek_queue:
+            return []
+        # 相同地址的请求合为一项, 按首次提交的顺序排列, 访问时间相同时先访问更早提交的地址
+        counts = {}
+        for seek_addr in seek_queue:
+            counts[seek_addr] = counts.get(seek_addr, 0) + 1
+        addrs = list(counts)
+        tracks = np.array([seek_addr[0] for seek_addr in addrs])
+        sectors = np.array([seek_addr[1] for seek_addr in addrs])
+        remaining = np.array([counts[seek_addr] for seek_addr in addrs])
+        seek_time = self.seek_speed / self.x_slow
+        sector_time = self.sector_time()
+        head, angle = self.now_headpointer, self.angle()
+        temp_seek_queue = []
+        for _ in range(len(seek_queue)):
+            seeks = np.abs(tracks - head) * seek_time
+            arrive = (angle + seeks / sector_time) % self.track_size
+            waits = np.where(sectors == -1, 0, (sectors - arrive) % self.track_size)
+            access_times = seeks + waits * sector_time
+            access_times[remaining == 0] = np.inf
+            i = int(np.argmin(access_times))
+            remaining[i] -= 1
+            temp_seek_queue.append(addrs[i])
+            head = addrs[i][0]
+            angle = arrive[i] if addrs[i][1] == -1 else (addrs[i][1] + 1) % self.track_size
+        return temp_seek_queue
+
+    def _order_DEADLINE(self, seek_queue, deadlines=None):
+        if not seek_queue:
+            return []
+        n = len(seek_queue)
+        if deadlines is None:  # 直接调用时所有请求都在此刻到达
+            deadlines = [self.clock + self.read_expire] * n
+        seek_queue, tracks, order = self._sort_by_track(seek_queue)
+        tracks = tracks.tolist()
+        rank = [0] * n  # 原下标 -> 排序后的位置
+        for k, i in enumerate(order.tolist()):
+            rank[i] = k
+        # 按截止时间排列的FIFO, 截止时间相同时按提交顺序
+        fifo = sorted(range(n), key=deadlines.__getitem__)
+        # next_unserved[k]: 排序后位置k及其后第一个未访问的位置(并查集, 路径压缩), n为哨兵
+        next_unserved = list(range(n + 1))
+
+        def find(k):
+            root = k
+            while next_unserved[root] != root:
+                root = next_unserved[root]
+            while next_unserved[k] != root:
+                next_unserved[k], k = root, next_unserved[k]
+            return root
+
+        # 按固定的寻道与旋转代价估计每个请求被访问的时刻
+        seek_time, rotate_time = self.seek_speed / self.x_slow, self.rotate_speed / self.x_slow
+        now, head = self.clock, self.now_headpointer
+        loc = bisect_left(tracks, head)
+        f = 0
+        temp_seek_queue = []
+        for _ in range(n):
+            while next_unserved[rank[fifo[f]]] != rank[fifo[f]]:
+                f += 1
+            if deadlines[fifo[f]] <= now:
+                # 最早到期的请求已超时, 先访问它, 再从那里继续扫描
+                k = rank[fifo[f]]
+            else:
+                # 单向电梯: 向磁道号增大的方向扫描, 扫到头回到最小的磁道号
+                k = find(loc)
+                if k == n:
+                    k = find(0)
+            next_unserved[k] = k + 1
+            seek_addr = seek_queue[k]
+            temp_seek_queue.append(seek_addr)
+            now += abs(tracks[k] - head) * seek_time + (rotate_time if seek_addr[1] != -1 else 0)
+            head = tracks[k]
+            loc = k + 1
+        return temp_seek_queue
+
+    # 把请求放入全局队列, 由调度线程与其他调用者的请求合并后按self.seek_algo统一访问.
+    # 返回Future, 请求的所有块都访问完后完成; callback(future)在完成时被调用.
+    # 请求的到达时刻为此刻的self.clock, 截止时刻为到达后expire秒(默认read_expire)
+    def submit(self, seek_queue, callback=None, expire=None):
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        with self.request_condition:
+            if not self.dispatching:
+                self.start_dispatcher()
+            arrival = self.clock
+            deadline = arrival + (self.read_expire if expire is None else expire)
+            self.pending_requests.append((future, list(seek_queue), arrival, deadline))
+            self.request_condition.notify()
+        return future
+
+    # 启动调度线程, seek_algo为合并后的队列使用的寻道算法
+    def start_dispatcher(self, seek_algo=None):
+        with self.request_condition:
+            if seek_algo is not None:
+                self.seek_algo = seek_algo
+            if self.dispatching:
+                return
+            self.dispatching = True
+            self.dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self.dispatcher.start()
+
+    # 停止调度线程, 已提交的请求会先被处理完
+    def stop_dispatcher(self):
+        with self.request_condition:
+            if not self.dispatching:
+                return
+            self.dispatching = False
+            self.request_condition.notify()
+        self.dispatcher.join()
+        self.dispatcher = None
+
+    def _dispatch_loop(self):
+        while True:
+            with self.request_condition:
+                while self.dispatching and not self.pending_requests:
+                    self.request_condition.wait()
+                if not self.pending_requests:
+                    return
+                # 取走此刻所有待处理的请求, 作为一批调度
+                batch = self.pending_requests
+                self.pending_requests = []
+            self._serve_batch(batch)
+
+    def _serve_batch(self, batch):
+        merged = []
+        deadlines = []
+        # 块地址 -> 请求该块的请求下标, 同一地址被多次请求时按提交顺序分配
+        owners = {}
+        remaining = []
+        for i, (future, seek_queue, arrival, deadline) in enumerate(batch):
+            merged.extend(seek_queue)
+            deadlines.extend([deadline] * len(seek_queue))
+            for seek_addr in seek_queue:
+                owners.setdefault(seek_addr, deque()).append(i)
+            remaining.append(len(seek_queue))
+        try:
+            seek_queue = self.schedule(merged, self.seek_algo, deadlines)
+            # 访问顺序中每个位置属于哪个请求, 折返点为None
+            positions = [owners[seek_addr].popleft() if owners.get(seek_addr) else None
+                         for seek_addr in seek_queue]
+            if seek_queue:
+                self._serve(seek_queue, self.seek_algo,
+                            arrivals=[None if i is None else batch[i][2] for i in positions])
+        except Exception as e:
+            for request in batch:
+                request[0].set_exception(e)
+            return
+        # 按各请求最后一块在访问顺序中的位置依次完成
+        for i, n in enumerate(remaining):
+            if n == 0:
+                batch[i][0].set_result(True)
+        for i in positions:
+            if i is not None:
+                remaining[i] -= 1
+                if remaining[i] == 0:
+                    batch[i][0].set_result(True)
+
+    def draw_disk_speed(self, title=None):
         plt.close("all")
         # ax = plt.subplot()
         plt.xlabel('disk access_algo')
@@ -930,9 +2178,30 @@ class Disk:
         # print(speed_list_MB)
         plt.bar(index, speed_list_MB, color="#87CEFA", width=0.35)
         plt.xticks(index, self.algo_list)
+        if title is not None:
+            plt.title(title)
         plt.savefig('disk.jpg')
         # plt.show()
 
+    # 各寻道算法的排队与服务延迟分布
+    def draw_latency(self):
+        plt.close("all")
+        latency = self.latency_histograms()
+        if not latency:
+            return
+        fig, axes = plt.subplots(1, 2, figsize=(12, 4), sharey=True)
+        centers = np.sqrt(LatencyHistogram.edges[:-1] * LatencyHistogram.edges[1:]) * 1000
+        for ax, index, name in zip(axes, (0, 1), ('queueing', 'service')):
+            for algo, histograms in latency.items():
+                histogram = histograms[index]
+                ax.plot(centers, histogram.counts[1:-1], label="{} p99 {:.1f} ms".format(
+                    algo, histogram.percentile(99) * 1000))
+            ax.set_xscale('log')
+            ax.set_xlabel(name + ' latency: ms')
+            ax.legend()
+        axes[0].set_ylabel('requests')
+        plt.savefig('disk_latency.jpg')
+
     def draw_track(self, seek_queue, algo):
         plt.close("all")
         track_queue = []
@@ -953,6 +2222,138 @@ class Disk:
         plt.savefig('last_track.jpg')
 
 
+class DiskVolume(Disk):
+    ''' 由多块Disk组成的卷, 对FileManager表现为一块(逻辑)磁盘, 逻辑块号 = 磁道号 * 每道扇区数 + 扇区号.
+        RAID-0: 每stripe_size块为一个条带, 条带轮流放在各块磁盘上, 每块磁盘只有约1/N的磁道;
+        RAID-1: 每块磁盘都存有全部的块, 读取时按条带轮流从各块磁盘读.
+        一次访问中各磁盘的队列分别按寻道算法排序, 并行访问(虚拟时钟模式下耗时取最慢的磁盘). '''
+
+    def __init__(self, disk_num, raid_level, stripe_size, block_size, track_num, sec_num,
+                 now_headpointer=53, x_slow=10, virtual_clock=False, seek_algo='FCFS', rotational=False):
+        if raid_level not in (0, 1):
+            raise ValueError("no such raid level " + str(raid_level))
+        super().__init__(block_size, track_num, sec_num, now_headpointer, x_slow,
+                         virtual_clock, seek_algo, rotational)
+        self.disk_num = disk_num
+        self.raid_level = raid_level
+        self.stripe_size = stripe_size
+        if raid_level == 0:
+            stripes = -(-track_num * sec_num // (stripe_size * disk_num))  # 每块磁盘上的条带数
+            member_tracks = -(-stripes * stripe_size // sec_num)
+        else:
+            member_tracks = track_num
+        self.disks = [Disk(block_size, member_tracks, sec_num, min(now_headpointer, member_tracks - 1), x_slow,
+                           virtual_clock, seek_algo, rotational) for _ in range(disk_num)]
+        for disk in self.disks:
+            disk.verbose = False
+        # 每次访问各磁盘的速度(B/s), 没有参与该次访问的磁盘记为0
+        self.disk_speed_list = []
+
+    # 逻辑块号 -> (磁盘号, 磁盘上的块号)
+    def _map_blocks(self, blocks):
+        stripes = blocks // self.stripe_size
+        disks = stripes % self.disk_num
+        if self.raid_level == 0:
+            return disks, (stripes // self.disk_num) * self.stripe_size + blocks % self.stripe_size
+        return disks, blocks
+
+    # 逻辑块号 -> [(磁盘号, 磁道号, 扇区号)], RAID-1为读取时使用的那一份
+    def locate(self, blocks):
+        disks, disk_blocks = self._map_blocks(np.asarray(blocks, dtype=np.int64))
+        return list(zip(disks.tolist(), (disk_blocks // self.track_size).tolist(),
+                        (disk_blocks % self.track_size).tolist()))
+
+    # 把逻辑地址的seek_queue拆成各磁盘的队列, 扇区为-1的折返点没有数据, 直接去掉; RAID-1写盘时每块磁盘都要写
+    def split(self, seek_queue, write=False):
+        if write and self.raid_level == 1:
+            queues = self.split(seek_queue)
+            return [[seek_addr for queue in queues for seek_addr in queue] for _ in self.disks]
+        queues = [[] for _ in self.disks]
+        for disk, track, sector in self.locate([track * self.track_size + sector
+                                                for track, sector in seek_queue if sector != -1]):
+            queues[disk].append((track, sector))
+        return queues
+
+    def access(self, seek_queue, seek_algo='FCFS', write=False):
+        if seek_algo not in self.seek_algos:
+            return False
+        self._serve(seek_queue, seek_algo, write)
+        return True
+
+    # 各磁盘自己排序, 卷上不排序
+    def schedule(self, seek_queue, seek_algo='FCFS', deadlines=None):
+        return seek_queue
+
+    # 延迟由各块磁盘分别记录, 卷上不记录排队延迟
+    def _serve(self, seek_queue, algo, write=False, arrivals=None):
+        with self.service_lock:
+            queues = self.split(seek_queue, write)
+            before = [disk.total_time for disk in self.disks]
+            busy = [(disk, queue) for disk, queue in zip(self.disks, queues) if queue]
+            if self.virtual_clock:
+                for disk, queue in busy:
+                    disk.access(queue, algo)
+            else:
+                threads = [threading.Thread(target=disk.access, args=(queue, algo)) for disk, queue in busy]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            times = [disk.total_time - start for disk, start in zip(self.disks, before)]
+            self.disk_speed_list.append([len(queue) * self.sector_size / t if t else 0
+                                         for queue, t in zip(queues, times)])
+            this_time_time = max(times)
+            self.clock = self.clock + this_time_time
+            self._record_access(this_time_time, sum(map(len, queues)) * self.sector_size)
+            self.algo_list.append(algo)
+            if self.disk_monitoring:
+                self.draw_track(seek_queue, algo)
+
+    # 各块磁盘的延迟直方图合并
+    def latency_histograms(self):
+        latency = {}
+        for disk in self.disks:
+            for algo, histograms in disk.latency_histograms().items():
+                merged = latency.setdefault(algo, (LatencyHistogram(), LatencyHistogram()))
+                for total, histogram in zip(merged, histograms):
+                    total.merge(histogram)
+        return latency
+
+    def set_now_headpointer(self, now_headpointer=53):
+        super().set_now_headpointer(now_headpointer)
+        for disk in self.disks:
+            disk.set_now_headpointer(min(now_headpointer, disk.track_num - 1))
+
+    def set_x_slow(self, x_slow=10):
+        super().set_x_slow(x_slow)
+        for disk in self.disks:
+            disk.set_x_slow(x_slow)
+
+    def set_virtual_clock(self, virtual_clock=True):
+        super().set_virtual_clock(virtual_clock)
+        for disk in self.disks:
+            disk.set_virtual_clock(virtual_clock)
+
+    # 每次访问的总带宽与各磁盘的带宽
+    def draw_disk_speed(self, title=None):
+        plt.close("all")
+        plt.xlabel('disk access_algo')
+        plt.ylabel('speed: MB/s')
+        index = np.arange(len(self.speed_list))
+        width = 0.8 / (self.disk_num + 1)
+        plt.bar(index, np.array(self.speed_list) / 1000, width=width, color="#87CEFA", label='volume')
+        disk_speed = np.array(self.disk_speed_list).reshape(-1, self.disk_num) / 1000
+        for i in range(self.disk_num):
+            plt.bar(index + (i + 1) * width, disk_speed[:, i], width=width, label='disk ' + str(i))
+        plt.xticks(index + width * self.disk_num / 2, self.algo_list)
+        plt.legend()
+        aggregate = "RAID-{} x{}, stripe {} block(s): aggregate {:.3f} MB/s".format(
+            self.raid_level, self.disk_num, self.stripe_size,
+            self.total_byte / self.total_time / 1000 if self.total_time else 0)
+        plt.title(aggregate if title is None else aggregate + '\n' + title)
+        plt.savefig('disk.jpg')
+
+
 if __name__ == '__main__':
     a = FileManager()
     # a.get_file('f1')
@@ -17,11 +17,21 @@ class Kernel:
     def __init__(self):
         self.my_shell = Shell()
         self.my_file_manager = FileManager(
-            storage_block_size, storage_track_num, storage_sec_num)
+            storage_block_size, storage_track_num, storage_sec_num,
+            backend=storage_backend, meta_blocks=storage_image_meta_blocks,
+            exec_cache_size=storage_exec_cache_size, max_extents=storage_max_extents,
+            virtual_clock=disk_virtual_clock, block_cache_size=storage_block_cache_size,
+            block_cache_policy=storage_block_cache_policy, read_ahead_max=storage_read_ahead_max,
+            rotational=disk_rotational_model, disks=storage_disk_num, raid_level=storage_raid_level,
+            stripe_size=storage_stripe_size, seek_algo=seek_algo,
+            write_buffer_blocks=storage_write_buffer_blocks, write_buffer_age=storage_write_buffer_age)
+        if disk_request_queue:
+            self.my_file_manager.disk.start_dispatcher(seek_algo)
         self.my_memory_manager = MemoryManager(mode=memory_management_mode,
                                                page_size=memory_page_size,
                                                page_number=memory_page_number,
-                                               physical_page=memory_physical_page_number)
+                                               physical_page=memory_physical_page_number,
+                                               schedule=memory_page_replacement)
         self.my_process_manager = ProcessManager(
             self.my_memory_manager,
             priority,
@@ -64,12 +74,13 @@ class Kernel:
             'mkf': 'create common file, format: mkf path type size, e.g. mkf my_file crwx 300',
             'dss': 'display storage status, format: dss',
             'dms': 'display memory status, format: dms',
-            'exec': 'execute file, format: exec path, e.g. exec test',
+            'exec': 'execute files, format: exec path1 [path2] ..., e.g. exec test test1',
             'chmod': 'change mode of file, format: chmod path new_mode, e.g. chmod test erwx',
             'ps': 'display process status, format: ps',
             'rs': 'display resource status, format: rs',
             'mon': 'start monitoring system resources, format: mon [-o], use -o to stop',
-            'td': 'tidy and defragment your disk, format: td',
+            'td': 'tidy and defragment your disk, format: td [max_blocks], with max_blocks only move about that many blocks per run',
+            'sync': 'write all buffered blocks back to disk, format: sync',
             'kill': 'kill process, format: kill pid',
             'exit': 'exit MiniOS'
         }
@@ -173,9 +184,10 @@ class Kernel:
                 elif tool == 'exec':
                     if argc >= 2:
                         path_list = command_split[1:]
-                        for path in path_list:
-                            my_file = self.my_file_manager.get_file(
-                                file_path=path, seek_algo=seek_algo)
+                        # load all executables with one disk schedule
+                        file_list = self.my_file_manager.get_files(
+                            file_paths=path_list, seek_algo=seek_algo)
+                        for my_file in file_list:
                             if my_file:
                                 if my_file['type'][3] == 'x':
                                     self.my_process_manager.create_process(
@@ -210,7 +222,17 @@ class Kernel:
                         monitor_thread.start()
 
                 elif tool == 'td':
-                    self.my_file_manager.tidy_disk()
+                    if argc >= 2:
+                        if command_split[1].isdigit() and int(command_split[1]) > 0:
+                            self.my_file_manager.tidy_disk(
+                                max_blocks=int(command_split[1]))
+                        else:
+                            self.report_error(cmd=tool)
+                    else:
+                        self.my_file_manager.tidy_disk()
+
+                elif tool == 'sync':
+                    print('sync: %d block(s) written' % self.my_file_manager.sync())
 
                 elif tool == 'kill':
                     if argc >= 2:
@@ -225,6 +247,7 @@ class Kernel:
 
                 elif tool == 'exit':
                     self.my_process_manager.running = False
+                    self.my_file_manager.unmount()
                     exit(0)
 
                 else:
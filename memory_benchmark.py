@@ -0,0 +1,129 @@
+# coding=utf-8
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from memory_manager import MemoryManager
+from config import memory_page_size, memory_physical_page_number
+
+
+def run_alloc_free(page_number, ops, max_pages, processes, page_size, physical_page, seed=0):
+    """
+    fill the virtual memory to about half, then replay a random mix of allocations and frees
+    :return: dict of metrics: allocations/frees per second and virtual pages handled per second
+    """
+    rng = np.random.default_rng(seed)
+    mm = MemoryManager(mode='p', page_size=page_size, page_number=page_number, physical_page=physical_page)
+    sizes = (rng.integers(1, max_pages + 1, ops) * page_size - rng.integers(0, page_size, ops)).tolist()
+    pids = rng.integers(0, processes, ops).tolist()
+    live = []  # (pid, aid, size) of the allocations still in memory
+    alloc_time, free_time = 0.0, 0.0
+    allocs, frees, failed, pages = 0, 0, 0, 0
+    for i in range(ops):
+        # allocate while the memory is less than half used, afterwards free and allocate evenly
+        if live and (mm.allocated * 2 > mm.total or rng.random() < 0.5):
+            pid, aid, size = live.pop(int(rng.integers(len(live))))
+            start = time.perf_counter()
+            mm.free(pid, aid)
+            free_time += time.perf_counter() - start
+            frees += 1
+        else:
+            start = time.perf_counter()
+            aid = mm.alloc(pids[i], sizes[i])
+            alloc_time += time.perf_counter() - start
+            if aid == -1:
+                failed += 1
+                continue
+            live.append((pids[i], aid, sizes[i]))
+            allocs += 1
+            size = sizes[i]
+        pages += -(-size // page_size)
+    return {
+        'virtual_pages': page_number,
+        'allocs': allocs,
+        'frees': frees,
+        'failed_allocs': failed,
+        'alloc_per_s': allocs / alloc_time if alloc_time else 0,
+        'free_per_s': frees / free_time if free_time else 0,
+        'pages_per_s': pages / (alloc_time + free_time) if alloc_time + free_time else 0,
+        'time_s': alloc_time + free_time,
+    }
+
+
+def run_access(mode, accesses, processes, allocs_per_process, page_size, page_number, physical_page, seed=0):
+    """
+    give every process a few allocations, then access random valid addresses of random processes
+    :return: dict of metrics: accesses per second and page faults ('p' mode)
+    """
+    rng = np.random.default_rng(seed)
+    mm = MemoryManager(mode=mode, page_size=page_size, page_number=page_number, physical_page=physical_page)
+    # fill about half of the memory, whole pages so every address below the total is valid in both modes
+    size = max(1, page_number // (2 * processes * allocs_per_process)) * page_size
+    for _ in range(allocs_per_process):
+        for pid in range(processes):
+            mm.alloc(pid, size)
+    pids = rng.integers(0, processes, accesses).tolist()
+    addresses = rng.integers(0, size * allocs_per_process, accesses).tolist()
+    start = time.perf_counter()
+    for pid, address in zip(pids, addresses):
+        mm.access(pid, address)
+    elapsed = time.perf_counter() - start
+    return {
+        'mode': mode,
+        'virtual_pages': page_number,
+        'processes': processes,
+        'allocations': processes * allocs_per_process,
+        'accesses': accesses,
+        'access_per_s': accesses / elapsed if elapsed else 0,
+        'page_fault': mm.page_fault if mode == 'p' else 0,
+        'time_s': elapsed,
+    }
+
+
+def run_benchmark(page_numbers=(10 ** 4, 10 ** 5, 10 ** 6), ops=20000, max_pages=64, processes=16,
+                  page_size=memory_page_size, physical_page=memory_physical_page_number, seed=0):
+    rows = []
+    for page_number in page_numbers:
+        rows.append(run_alloc_free(page_number, ops, max_pages, processes, page_size, physical_page, seed))
+    return pd.DataFrame(rows)
+
+
+def run_access_benchmark(modes=('cb', 'p'), accesses=20000, processes=16, allocs_per_process=8,
+                         page_size=memory_page_size, page_number=10 ** 4,
+                         physical_page=memory_physical_page_number, seed=0):
+    rows = []
+    for mode in modes:
+        rows.append(run_access(mode, accesses, processes, allocs_per_process, page_size, page_number,
+                               physical_page, seed))
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='measure the paging allocator on large virtual memories')
+    parser.add_argument('--pages', nargs='+', type=int, default=[10 ** 4, 10 ** 5, 10 ** 6],
+                        help='virtual page numbers to test')
+    parser.add_argument('--ops', type=int, default=20000, help='allocations and frees per run')
+    parser.add_argument('--max-pages', type=int, default=64, help='largest allocation in pages')
+    parser.add_argument('--processes', type=int, default=16)
+    parser.add_argument('--accesses', type=int, default=20000, help='accesses per mode in the cb/p comparison')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='memory_benchmark',
+                        help='write <out>.csv/json for alloc/free and <out>_access.csv/json for accesses')
+    args = parser.parse_args()
+
+    results = {
+        args.out: run_benchmark(args.pages, args.ops, args.max_pages, args.processes, seed=args.seed),
+        args.out + '_access': run_access_benchmark(accesses=args.accesses, processes=args.processes,
+                                                   seed=args.seed),
+    }
+    for out, result in results.items():
+        result.to_csv(out + '.csv', index=False)
+        with open(out + '.json', 'w') as f:
+            json.dump(result.to_dict(orient='records'), f, indent=2)
+        with pd.option_context('display.max_columns', None, 'display.width', 200):
+            print(result.round(3).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
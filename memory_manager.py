@@ -3,21 +3,67 @@ import numpy as np
 import seaborn
 import pandas as pd
 import matplotlib.pyplot as plt
+import bisect
 import copy
+import heapq
+import itertools
+import sys
+from array import array
+from collections import OrderedDict
+from cache_policy import LRUPolicy, ClockPolicy, ARCPolicy
 
 
 class PageTable:
     def __init__(self):
         # frame number represent the virtual page's location in physical memory
-        # the table has a k_v as (page, [frame_number, validation])
-        self.table = {}
+        # logical page i of the process is the virtual page pages[i], it is in
+        # frame frames[i] when valid[i] == 1, -1 means not in physical memory
+        self.pages = array('i')
+        self.frames = array('i')
+        self.valid = array('b')
+        # order[i] is the insertion number of logical page i. Deleting pages
+        # keeps it increasing, so the logical page of a virtual page is found
+        # by bisect and the pages after a deleted one need no renumbering
+        self.order = array('q')
+        self.order_of = {}  # virtual page number -> insertion number
+        self.inserted = 0
         self.max_address = None
 
+    def __len__(self):
+        return len(self.pages)
+
     def insert(self, page_num):  # allocated virtual page number
-        self.table[page_num] = [None, -1]
+        self.order_of[page_num] = self.inserted
+        self.order.append(self.inserted)
+        self.inserted += 1
+        self.pages.append(page_num)
+        self.frames.append(-1)
+        self.valid.append(-1)
+
+    # the logical page of a virtual page
+    def logical(self, page_num):
+        return bisect.bisect_left(self.order, self.order_of[page_num])
+
+    def _delete_range(self, start, end):
+        for entries in (self.pages, self.frames, self.valid, self.order):
+            del entries[start:end]
 
     def delete(self, page_num):  # free virtual page number
-        self.table.pop(page_num)
+        idx = self.logical(page_num)
+        del self.order_of[page_num]
+        self._delete_range(idx, idx + 1)
+
+    def delete_pages(self, page_nums):  # free a batch of virtual page numbers
+        # the pages of one allocation are consecutive logical pages, each run
+        # is removed with one slice deletion, from the last run to the first
+        idxs = sorted(self.logical(page_num) for page_num in page_nums)
+        for page_num in page_nums:
+            del self.order_of[page_num]
+        end = len(idxs)
+        for i in range(len(idxs) - 1, -1, -1):
+            if i == 0 or idxs[i - 1] != idxs[i] - 1:
+                self._delete_range(idxs[i], idxs[end - 1] + 1)
+                end = i
 
     def transform(self, address, page_size):
         """
@@ -26,12 +72,19 @@ class PageTable:
         :return: if find valid,return the physical_page_number, else return -1
         """
         idx = address // page_size  # 页表偏移量
-        if idx < len(self.table):
-            index = list(self.table.keys())[idx]  # 虚页号
-            return index
+        if idx < len(self.pages):
+            return self.pages[idx]  # 虚页号
         else:
             return -1
 
+    def lookup(self, pnum):
+        """
+        :param pnum: the virtual page to look up
+        :return: [frame_number, validation] of the virtual page
+        """
+        idx = self.logical(pnum)
+        return [self.frames[idx], self.valid[idx]]
+
     # when the virtual page being schedule in/out the physical memory
     def modify(self, pnum, fnum, valid):
         """
@@ -39,13 +92,200 @@ class PageTable:
         :param fnum: the frame number to add
         :param valid: if this virtual page in physical memory. = 1 in/ -1 not
         """
+        idx = self.logical(pnum)
         if valid == 1:
-            self.table[pnum] = [fnum, valid]
-        else:
-            self.table[pnum][1] = valid
+            self.frames[idx] = fnum
+        self.valid[idx] = valid
+
+    def memory_size(self):
+        # bytes used by the entry arrays and the page index
+        return (len(self.pages) * (self.pages.itemsize + self.frames.itemsize + self.valid.itemsize
+                                   + self.order.itemsize)
+                + sys.getsizeof(self.order_of))
+
+
+class FIFOPolicy:
+    """
+    first in first out, switch out the page loaded earliest
+    same interface as the policies in cache_policy: request() returns True on
+    a hit, on a miss it loads the page and the switched out page is in victim
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.queue = OrderedDict()
+        self.evictions = 0
+        self.victim = None
+
+    def request(self, pnum):
+        self.victim = None
+        if pnum in self.queue:
+            return True
+        if len(self.queue) >= self.capacity:
+            self.victim, _ = self.queue.popitem(last=False)
+            self.evictions += 1
+        self.queue[pnum] = None
+        return False
+
+    def remove(self, pnum):
+        self.queue.pop(pnum, None)
+
+    def __contains__(self, pnum):
+        return pnum in self.queue
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class LFUPolicy:
+    """
+    least frequently used, switch out the page with the fewest accesses since
+    it was loaded, the least recently used one among equals
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.freq = {}  # page -> access count
+        self.buckets = {}  # access count -> pages in LRU order
+        self.min_freq = 0
+        self.evictions = 0
+        self.victim = None
+
+    def _bump(self, pnum, freq):
+        self.freq[pnum] = freq
+        self.buckets.setdefault(freq, OrderedDict())[pnum] = None
+
+    def request(self, pnum):
+        self.victim = None
+        if pnum in self.freq:
+            freq = self.freq[pnum]
+            bucket = self.buckets[freq]
+            del bucket[pnum]
+            if not bucket:
+                del self.buckets[freq]
+                if self.min_freq == freq:
+                    self.min_freq = freq + 1
+            self._bump(pnum, freq + 1)
+            return True
+        if len(self.freq) >= self.capacity:
+            bucket = self.buckets[self.min_freq]
+            self.victim, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self.buckets[self.min_freq]
+            del self.freq[self.victim]
+            self.evictions += 1
+        self._bump(pnum, 1)
+        self.min_freq = 1
+        return False
+
+    def remove(self, pnum):
+        if pnum not in self.freq:
+            return
+        freq = self.freq.pop(pnum)
+        bucket = self.buckets[freq]
+        del bucket[pnum]
+        if not bucket:
+            del self.buckets[freq]
+            if self.min_freq == freq:
+                self.min_freq = min(self.buckets) if self.buckets else 0
+
+    def __contains__(self, pnum):
+        return pnum in self.freq
+
+    def __len__(self):
+        return len(self.freq)
+
+
+class OPTPolicy:
+    """
+    optimal (Belady), switch out the page whose next access is farthest away,
+    it needs the whole access sequence in advance so it only replays a
+    recorded trace
+    """
+
+    def __init__(self, capacity, trace):
+        """
+        :param capacity: the number of physical pages
+        :param trace: the accessed virtual pages in order, a freed page p is recorded as -1 - p
+        """
+        self.capacity = capacity
+        self.trace = trace
+        # next_use[t]: the position of the next access to the page accessed at t
+        self.next_use = [0] * len(trace)
+        last = {}
+        for t in range(len(trace) - 1, -1, -1):
+            pnum = trace[t]
+            if pnum < 0:
+                # the accesses before a free never reach the later owner of the page
+                last[-1 - pnum] = len(trace)
+            else:
+                self.next_use[t] = last.get(pnum, len(trace))
+                last[pnum] = t
+        self.cursor = 0
+        self.resident = {}  # page -> position of its next access
+        self.heap = []  # (-next access, page), stale entries are skipped
+        self.evictions = 0
+        self.victim = None
+
+    def request(self, pnum):
+        self.victim = None
+        # skip the frees, remove() has been called for them
+        while self.trace[self.cursor] < 0:
+            self.cursor += 1
+        if self.trace[self.cursor] != pnum:
+            raise ValueError('page %d is not the next page of the trace' % pnum)
+        next_use = self.next_use[self.cursor]
+        self.cursor += 1
+        hit = pnum in self.resident
+        if not hit and len(self.resident) >= self.capacity:
+            while True:
+                farthest, page = heapq.heappop(self.heap)
+                if self.resident.get(page) == -farthest:
+                    self.victim = page
+                    del self.resident[page]
+                    self.evictions += 1
+                    break
+        self.resident[pnum] = next_use
+        heapq.heappush(self.heap, (-next_use, pnum))
+        return hit
+
+    def remove(self, pnum):
+        self.resident.pop(pnum, None)
+
+    def __contains__(self, pnum):
+        return pnum in self.resident
+
+    def __len__(self):
+        return len(self.resident)
+
+
+def replay_page_trace(trace, capacity, policy):
+    """
+    :param trace: the accessed virtual pages in order, a freed page p is recorded as -1 - p
+    :param capacity: the number of physical pages
+    :param policy: a name in MemoryManager.replacements or 'OPT'
+    :return: the number of page faults
+    """
+    if policy == 'OPT':
+        replacement = OPTPolicy(capacity, trace)
+    else:
+        replacement = MemoryManager.replacements[policy](capacity)
+    page_fault = 0
+    for pnum in trace:
+        if pnum < 0:
+            replacement.remove(-1 - pnum)
+        elif not replacement.request(pnum):
+            page_fault += 1
+    return page_fault
 
 
 class MemoryManager:
+    # page replacement algorithms that can run online, OPT is only replayed
+    replacements = {'FIFO': FIFOPolicy, 'LRU': LRUPolicy, 'CLOCK': ClockPolicy,
+                    'LFU': LFUPolicy, 'ARC': ARCPolicy}
+    # the number of latest trace entries replayed to compare with OPT
+    trace_window = 4096
+
     def __init__(self, mode, page_size=1024, page_number=8,
                  physical_page=3, schedule='FIFO'):
         """
@@ -53,16 +293,35 @@ class MemoryManager:
         :param page_size: the size of each page(useful when mode == 'p')
         :param page_number: the total page num of the virtual memory
         :param physical_page: the total page num of the physical memory
+        :param schedule: the page replacement algorithm, a name in MemoryManager.replacements
         """
         if mode == 'p':
             # record the virtual memory
-            self.virtual_memory = np.array(
-                [[page_size, -1, 0] for i in range(page_number)])
+            self.virtual_memory = np.tile(
+                np.array([page_size, -1, 0]), (page_number, 1))
+            # free virtual pages as a stack, at first the lowest page number is
+            # popped first, afterwards the most recently freed pages are reused
+            self.free_pages = list(range(page_number - 1, -1, -1))
+            # the virtual pages of every allocation, has a k_v as (pid: {aid: [page]})
+            self.pid_pages = {}
             # record = np.zeros((physical_page, 2))
             self.physical_memory = [-1 for i in range(physical_page)]
-            # for LRU algorithm, the first one is the Least Recent Used, the
-            # last is recently visited
-            self.schedule_queue = []
+            # free frames as a stack, at first the lowest frame number is popped
+            # first, afterwards the most recently freed frames are reused
+            self.free_frames = list(range(physical_page - 1, -1, -1))
+            # reverse map of physical_memory: virtual page -> frame, -1 if not
+            # in physical memory
+            self.page_frame = [-1 for i in range(page_number)]
+            if schedule not in self.replacements:
+                raise ValueError("no such page replacement algorithm '" + schedule + "'")
+            # keeps the pages in physical memory and chooses the one to switch out
+            self.replacement = self.replacements[schedule](physical_page)
+            # every accessed virtual page in order, a freed page p is recorded as
+            # -1 - p, replayed to compare with the OPT algorithm; only the
+            # latest trace_window entries are kept
+            self.page_trace = array('i')
+            self.trace_events = 0  # entries recorded so far
+            self.window_rates = None  # (trace_events, rates) of the last replay
             self.ps = page_size
             self.pn = page_number
             self.ppn = physical_page  # the number of physical page
@@ -76,6 +335,9 @@ class MemoryManager:
                 hole: [start_address, size]
                     '''
             self.r = []  # record for memory status
+            # allocations of every process sorted by start address, has a k_v as
+            # (pid: [start_addresses, sizes, prefix]), prefix[i] = sum(sizes[:i])
+            self.pid_allocs = {}
             # record for the empty memory
             self.hole = [[0, page_size * page_number]]
         self.mode = mode
@@ -127,33 +389,28 @@ class MemoryManager:
 
     # if the memory has the page structure
     def page_alloc(self, pid, size):
-        s = size
         aid = self.cur_aid
         self.cur_aid += 1
-        for i in range(self.pn):
-            if self.virtual_memory[i][1] == -1:  # the page is empty
-                self.virtual_memory[i][1] = pid
-                if pid in self.page_tables.keys():  # the process has a page table
-                    ptable = self.page_tables[pid]
-                else:  # the precess does not has a page table
-                    ptable = PageTable()  # create one
-                    self.page_tables[pid] = ptable
-                ptable.insert(i)  # add the virtual page
-                if s >= self.ps:
-                    self.virtual_memory[i][0] = self.ps
-                    s -= self.ps
-                else:
-                    self.virtual_memory[i][0] = s
-                    s -= s
-                self.virtual_memory[i][2] = aid
-            if s == 0:
-                self.allocated += size
-                break
-        # if the file cannot be loaded into memory then free the above
-        # allocation
-        if s > 0:
-            self.page_free(pid, aid)
+        # the file takes ceil(size / page_size) pages, at least one, the last one may be partly used
+        n = max(1, -(-size // self.ps))
+        # if the file cannot be loaded into memory
+        if n > len(self.free_pages):
             return -1
+        pages = self.free_pages[-n:][::-1]
+        del self.free_pages[-n:]
+        self.virtual_memory[pages, 0] = self.ps
+        self.virtual_memory[pages[-1], 0] = size - self.ps * (n - 1)
+        self.virtual_memory[pages, 1] = pid
+        self.virtual_memory[pages, 2] = aid
+        if pid in self.page_tables.keys():  # the process has a page table
+            ptable = self.page_tables[pid]
+        else:  # the precess does not has a page table
+            ptable = PageTable()  # create one
+            self.page_tables[pid] = ptable
+        for i in pages:
+            ptable.insert(i)  # add the virtual page
+        self.pid_pages.setdefault(pid, {})[aid] = pages
+        self.allocated += size
         # if the file be loaded successfully
         return aid
 
@@ -161,7 +418,7 @@ class MemoryManager:
     def continue_alloc(self, pid, size):
         aid = self.cur_aid
         self.cur_aid += 1
-        fit = 1e5  # record the minimum hole size to load the file
+        fit = self.total + 1  # record the minimum hole size to load the file
         besti = -1  # record the best hole to put the file
         # find the best hole
         for i in range(len(self.hole)):
@@ -173,6 +430,11 @@ class MemoryManager:
             # add the allocation to record
             self.allocated += size
             self.r.append([self.hole[besti][0], size, pid, aid])
+            starts, sizes, _ = self.pid_allocs.setdefault(pid, [[], [], [0]])
+            i = bisect.bisect(starts, self.hole[besti][0])
+            starts.insert(i, self.hole[besti][0])
+            sizes.insert(i, size)
+            self.index_pid(pid)
             # if the file size == hole size
             if self.hole[besti][1] == size:
                 self.hole.pop(besti)
@@ -225,36 +487,56 @@ class MemoryManager:
             print("error: the memory does not exist")
             return False
         for i in range(len(delete) - 1, -1, -1):
-            self.r.pop(delete[i])
+            base_address = self.r.pop(delete[i])[0]
+            starts, sizes, _ = self.pid_allocs[pid]
+            j = bisect.bisect_left(starts, base_address)
+            starts.pop(j)
+            sizes.pop(j)
+        if self.pid_allocs[pid][0]:
+            self.index_pid(pid)
+        else:
+            self.pid_allocs.pop(pid)
         return True
 
+    # recompute the prefix sums of a process's allocation sizes
+    def index_pid(self, pid):
+        allocs = self.pid_allocs[pid]
+        allocs[2] = [0] + list(itertools.accumulate(allocs[1]))
+
     # find the aiming page and delete it from page table
     def page_free(self, pid, aid):
         # print('chenbin: debug', 'pid', pid, 'aid', aid)
-        status = 0
-        for i in range(self.pn):
-            if self.virtual_memory[i][1] == pid and (
-                    self.virtual_memory[i][2] == aid or aid is None):
-                status = 1
-
-                if i in self.physical_memory:  # if the page in physical memory, free it.
-                    self.physical_memory[self.physical_memory.index(i)] = -1
-                    self.physicalsize -= self.virtual_memory[i][0]
-                    self.schedule_queue.remove(i)
-
-                # to delete the process's page item
-                ptable = self.page_tables[pid]
-                ptable.delete(i)
-
-                # to free it from virtual memory.
-                self.allocated -= self.virtual_memory[i][0]
-                self.virtual_memory[i][0] = self.ps
-                self.virtual_memory[i][1] = -1
-                self.virtual_memory[i][2] = 0
-
-        if status == 0:
+        allocations = self.pid_pages.get(pid, {})
+        if aid is None:
+            pages = [i for aid in allocations for i in allocations[aid]]
+            allocations.clear()
+        elif aid in allocations:
+            pages = allocations.pop(aid)
+        else:
+            pages = []
+        if not pages:
             # print("error! That memory not Found.")
             return False
+
+        for i in pages:
+            if self.page_frame[i] != -1:  # if the page in physical memory, free it.
+                self.physical_memory[self.page_frame[i]] = -1
+                self.free_frames.append(self.page_frame[i])
+                self.page_frame[i] = -1
+                self.physicalsize -= self.virtual_memory[i][0]
+            # also forget the history the algorithm keeps for the page
+            self.replacement.remove(i)
+
+        # to delete the process's page items
+        self.page_tables[pid].delete_pages(pages)
+
+        # to free it from virtual memory.
+        self.allocated -= int(self.virtual_memory[pages, 0].sum())
+        self.virtual_memory[pages, 0] = self.ps
+        self.virtual_memory[pages, 1] = -1
+        self.virtual_memory[pages, 2] = 0
+        self.free_pages.extend(reversed(pages))
+        self.record_trace([-1 - i for i in pages])
         return True
 
     def page1_access(self, pid, address):
@@ -277,98 +559,80 @@ class MemoryManager:
             print("ERROR ADDRESS !!!!")
             return
 
-        if self.schedule == 'LRU':
-            self.LRU(virtual_pageID, ptable)
-        elif self.schedule == 'FIFO':
-            self.FIFO(virtual_pageID, ptable)
-        pass  # more algorithm to be continued
+        self.record_trace([virtual_pageID])
+        self.replacement.request(virtual_pageID)
+        if ptable.lookup(virtual_pageID)[1] != 1:
+            self.page_in(virtual_pageID, ptable, self.replacement.victim)
 
     def continue_access(self, pid, address):
-        virtual_memory = pd.DataFrame(
-            self.r,
-            columns=[
-                'start_address',
-                'size',
-                'pid',
-                'aid'])
-        memory = virtual_memory[virtual_memory['pid'] == pid]
-        memory = memory.sort_values('start_address')
-        delta, i = address, 0
-        while delta > 0 and i < memory.shape[0]:
-            delta -= memory.iloc[i]['size']
-            i += 1
-        if delta > 0:
+        """
+        :param pid: the process to visit
+        :param address: the relative address of the process, counted over its
+                        allocations in the order of their start addresses
+        :return: the absolute address, -1 if not found
+        """
+        starts, sizes, prefix = self.pid_allocs.get(pid, [[], [], [0]])
+        if address > prefix[-1]:
             print('Error, memory access not found!')
+            return -1
+        if not starts or address < 0:
+            return -1
+        # the allocation holding the address, the end of the last one included
+        i = min(bisect.bisect(prefix, address), len(starts)) - 1
+        return starts[i] + address - prefix[i]
 
-    def LRU(self, pnum, ptable):
+    def page_in(self, pnum, ptable, victim):
         """
+        handle a page fault, load the page into a free frame or into the frame
+        of the page switched out by the replacement algorithm
         :param pnum: the virtual page to be switched in physical memory
         :param ptable: the ptable records the virtual page
+        :param victim: the virtual page to be switched out, None if a frame is free
         """
-        if ptable.table[pnum][1] == 1:  # the visiting page in physical memory, just change queue
-            self.schedule_queue.remove(pnum)
-            self.schedule_queue.append(pnum)
-
-        elif -1 in self.physical_memory:  # the memory is still available
-            self.physical_memory[self.physical_memory.index(-1)] = pnum
-            self.physicalsize += self.virtual_memory[pnum][0]
-            self.schedule_queue.append(pnum)  # enlarge queue
-            ptable.modify(
-                pnum,
-                self.physical_memory.index(pnum),
-                1)  # modify the page table
-            self.page_fault += 1  # page_fault ++
-
+        self.page_fault += 1  # page_fault ++
+        if victim is None:  # the memory is still available
+            index = self.free_frames.pop()
         else:  # switch page
-            # always switch out the first in the queue
-            index = self.physical_memory.index(self.schedule_queue[0])
-            self.physical_memory[index] = pnum
-            pid = self.virtual_memory[self.schedule_queue[0]][2]
+            index = self.page_frame[victim]
+            self.page_frame[victim] = -1
+            pid = self.virtual_memory[victim][1]
 
             # modify the physical memory status
-            self.physicalsize -= self.virtual_memory[self.schedule_queue[0]][0]
-            self.physicalsize += self.virtual_memory[pnum][0]
-            self.page_fault += 1  # page_fault ++
-
-            # change the page table and modify the queue
-            p1 = self.page_tables[pid]
-            p1.modify(self.schedule_queue[0], 0, -1)
-            self.schedule_queue.pop(0)
-            self.schedule_queue.append(pnum)
-            ptable.modify(pnum, index, 1)
-
-    def FIFO(self, pnum, ptable):
-        """
-        :param pnum: the virtual page to be switched in physical memory
-        :param ptable: the ptable records the virtual page
-        :return:
-        """
-        if ptable.table[pnum][1] != 1 and -1 in self.physical_memory:
-            self.physical_memory[self.physical_memory.index(-1)] = pnum
-            self.physicalsize += self.virtual_memory[pnum][0]
-            self.schedule_queue.append(pnum)  # enlarge queue
-            ptable.modify(
-                pnum,
-                self.physical_memory.index(pnum),
-                1)  # modify the page table
-            self.page_fault += 1  # page_fault ++
-        elif ptable.table[pnum][1] != 1:
-            # always switch out the first in the queue
-            index = self.physical_memory.index(self.schedule_queue[0])
-            self.physical_memory[index] = pnum
-            pid = self.virtual_memory[self.schedule_queue[0]][2]
+            self.physicalsize -= self.virtual_memory[victim][0]
 
-            # modify the physical memory status
-            self.physicalsize -= self.virtual_memory[self.schedule_queue[0]][0]
-            self.physicalsize += self.virtual_memory[pnum][0]
-            self.page_fault += 1  # page_fault ++
+            # change the page table of the victim's process
+            self.page_tables[pid].modify(victim, 0, -1)
 
-            # change the page table and modify the queue
-            p1 = self.page_tables[pid]
-            p1.modify(self.schedule_queue[0], 0, -1)
-            self.schedule_queue.pop(0)
-            self.schedule_queue.append(pnum)
-            ptable.modify(pnum, index, 1)
+        self.physical_memory[index] = pnum
+        self.page_frame[pnum] = index
+        self.physicalsize += self.virtual_memory[pnum][0]
+        ptable.modify(pnum, index, 1)  # modify the page table
+
+    def record_trace(self, entries):
+        self.page_trace.extend(entries)
+        self.trace_events += len(entries)
+        if len(self.page_trace) > 2 * self.trace_window:
+            del self.page_trace[:-self.trace_window]
+
+    def window_fault_rates(self):
+        """
+        replay the latest trace_window entries with the configured algorithm
+        and with OPT (the lower bound), both from empty physical memory
+        :return: (fault rate, OPT fault rate, accesses replayed)
+        """
+        events = self.trace_events
+        if self.window_rates is not None and self.window_rates[0] == events:
+            return self.window_rates[1]
+        # a snapshot, the process thread keeps recording while memory_watching runs
+        trace = self.page_trace[-self.trace_window:]
+        accesses = sum(1 for pnum in trace if pnum >= 0)
+        if accesses:
+            rates = (replay_page_trace(trace, self.ppn, self.schedule) / accesses,
+                     replay_page_trace(trace, self.ppn, 'OPT') / accesses, accesses)
+        else:
+            rates = (0.0, 0.0, 0)
+        self.window_rates = (events, rates)
+        return rates
 
     def page_show(self):
         print('total: %-dB allocated: %-dB free: %-dB' % (self.total, self.allocated,
@@ -380,6 +644,9 @@ class MemoryManager:
                     "block #%d  %-4d/%-4d Byte(s)  pid =%-3d  aid =%-3d" % (i, self.virtual_memory[i][0], self.ps,
                                                                             self.virtual_memory[i][1],
                                                                             self.virtual_memory[i][2]))
+        for pid, ptable in self.page_tables.items():
+            if len(ptable):
+                print('page table: pid =%-3d  %-4d page(s)  %d Byte(s)' % (pid, len(ptable), ptable.memory_size()))
 
     def continue_show(self):
         print('total: %-dB allocated: %-dB free: %-dB' % (self.total, self.allocated,
@@ -426,10 +693,11 @@ class MemoryManager:
             page_fault_rate = 0.0
         else:
             page_fault_rate = self.page_fault / self.page_access
+        window_rate, opt_rate, window = self.window_fault_rates()
 
         ax1.set_title(
-            '%.2f memory access, page_fault rate %.2f' %
-            (self.page_access, page_fault_rate))
+            '%d memory access, %s page_fault rate %.2f\nlast %d access: %s %.2f, OPT %.2f' %
+            (self.page_access, self.schedule, page_fault_rate, window, self.schedule, window_rate, opt_rate))
 
         if len(self.physical_rate) > 10:
             ax1.plot(self.x, self.physical_rate[-10:], label='physical', c='r')
@@ -4,6 +4,7 @@ import time
 import threading
 import sys
 import copy
+import functools
 from hardware_resource import HardwareResource
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -12,6 +13,15 @@ import seaborn as sns
 # 5 status of process: running, waiting, ready,terminated, waiting(Printer)
 # A large number means high priority
 
+# change "cpu 5" -> ("cpu", 5), cached because the same executable is launched many times
+@functools.lru_cache(maxsize=4096)
+def parse_command(command):
+    info = str.split(command)
+    if len(info) > 1:
+        info[1] = int(info[1])
+    return tuple(info)
+
+
 # PCB
 class ProcessControlBlock:
     def __init__(self, pid, ppid, create_time, name, priority, content, size):
@@ -23,12 +33,8 @@ class ProcessControlBlock:
         self.size = size
         self.pc = 0
 
-        self.command_queue = []  # init
-        for command in content:  # change "cpu 5" -> ["cpu",5]
-            info = str.split(command)
-            if len(info) > 1:
-                info[1] = int(info[1])
-            self.command_queue.append(info)
+        # init, each command is a fresh list because the remaining time is counted down in place
+        self.command_queue = [list(parse_command(command)) for command in content]
         self.status = "ready"
 
 
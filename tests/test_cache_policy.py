@@ -0,0 +1,104 @@
+# coding=utf-8
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from cache_policy import LRUPolicy, ClockPolicy, ARCPolicy
+
+policies = {'LRU': LRUPolicy, 'CLOCK': ClockPolicy, 'ARC': ARCPolicy}
+
+
+# 当前在缓存中的键
+def resident(policy):
+    if isinstance(policy, LRUPolicy):
+        return set(policy.entries)
+    if isinstance(policy, ClockPolicy):
+        return set(policy.slot_of)
+    return set(policy.t1) | set(policy.t2)
+
+
+def random_trace(rng, n, keys):
+    # 一部分键访问频繁, 其余的只偶尔出现, 另有少量remove
+    hot = rng.integers(0, max(1, keys // 4), n)
+    cold = rng.integers(0, keys, n)
+    trace = np.where(rng.random(n) < 0.6, hot, cold).tolist()
+    removes = rng.random(n) < 0.05
+    return [('remove' if removed else 'request', key) for removed, key in zip(removes.tolist(), trace)]
+
+
+@pytest.mark.parametrize('name', sorted(policies))
+@pytest.mark.parametrize('capacity', [1, 3, 16])
+@pytest.mark.parametrize('seed', range(5))
+def test_policy_keeps_cache_invariants(name, capacity, seed):
+    rng = np.random.default_rng(seed)
+    policy = policies[name](capacity)
+    evictions = 0
+    for op, key in random_trace(rng, 2000, 4 * capacity + 4):
+        before = resident(policy)
+        if op == 'remove':
+            policy.remove(key)
+            assert resident(policy) == before - {key}
+            continue
+        hit = policy.request(key)
+        after = resident(policy)
+        assert hit == (key in before)
+        assert key in after and len(after) == len(policy) <= capacity
+        if hit:
+            assert after == before
+        elif len(before) < capacity:  # 缓存未满时不淘汰
+            assert after == before | {key}
+        else:  # 缓存已满时恰好淘汰一个键
+            assert len(after - {key}) == capacity - 1 and after - {key} < before
+            evictions += 1
+        # victim是这次被淘汰的键
+        assert (before - after) == ({policy.victim} if policy.victim is not None else set())
+        assert policy.evictions == evictions
+
+
+def test_lru_matches_ordered_dict():
+    rng = np.random.default_rng(0)
+    policy, model = LRUPolicy(8), OrderedDict()
+    for key in rng.integers(0, 20, 3000).tolist():
+        hit = key in model
+        model[key] = None
+        model.move_to_end(key)
+        if len(model) > 8:
+            model.popitem(last=False)
+        assert policy.request(key) == hit
+        assert list(policy.entries) == list(model)
+
+
+def test_clock_gives_referenced_keys_a_second_chance():
+    policy = ClockPolicy(3)
+    for key in 'abc':
+        policy.request(key)
+    assert policy.request('a')  # a的访问位置1
+    policy.request('d')  # 指针跳过a(清零), 淘汰b
+    assert resident(policy) == {'a', 'c', 'd'}
+    policy.request('e')  # 指针停在c, c的访问位为0, 被淘汰
+    assert resident(policy) == {'a', 'd', 'e'}
+
+
+def test_arc_keeps_directory_bounds():
+    rng = np.random.default_rng(1)
+    capacity = 8
+    policy = ARCPolicy(capacity)
+    for op, key in random_trace(rng, 5000, 40):
+        getattr(policy, op)(key)
+        lists = (policy.t1, policy.t2, policy.b1, policy.b2)
+        keys = [key for entries in lists for key in entries]
+        assert len(keys) == len(set(keys))  # 四个列表互不相交
+        assert len(policy.t1) + len(policy.b1) <= capacity
+        assert len(keys) <= 2 * capacity
+        assert 0 <= policy.p <= capacity
+
+
+def test_arc_resists_a_scan():
+    # 访问过两次的块在t2中, 一次性扫过的大量块只在t1中轮换, 不会把它们挤出去
+    arc, lru = ARCPolicy(4), LRUPolicy(4)
+    for policy in (arc, lru):
+        for key in ['x', 'y', 'x', 'y'] + list(range(10)):
+            policy.request(key)
+    assert {'x', 'y'} <= resident(arc)
+    assert not {'x', 'y'} & resident(lru)
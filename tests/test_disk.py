@@ -0,0 +1,138 @@
+# coding=utf-8
+from bisect import bisect_left
+
+import numpy as np
+import pytest
+
+from file_manager import Disk
+
+
+# 以下为改写前逐个比较的排序方法, 作为_order_*的参照
+def baseline_SSTF(seek_queue, head, track_num):
+    seek_queue = list(seek_queue)
+    temp_seek_queue = [(head, 0)]
+    while seek_queue:
+        min_track_distance = track_num
+        for seek_addr in seek_queue:
+            temp_now_headpointer = temp_seek_queue[-1][0]
+            track_distance = abs(seek_addr[0] - temp_now_headpointer)
+            if track_distance < min_track_distance:
+                min_track_distance = track_distance
+                loc = seek_queue.index(seek_addr)
+        temp_seek_queue.append(seek_queue[loc])
+        seek_queue.pop(loc)
+    temp_seek_queue.pop(0)
+    return temp_seek_queue
+
+
+def baseline_sweep(seek_queue, head):
+    seek_queue = sorted(seek_queue, key=lambda item: item[0])
+    for loc in range(len(seek_queue)):
+        if seek_queue[loc][0] >= head:
+            break
+    return seek_queue, loc
+
+
+def baseline_SCAN(seek_queue, head, track_num):
+    seek_queue, loc = baseline_sweep(seek_queue, head)
+    if seek_queue[loc:] == seek_queue:
+        return seek_queue
+    return seek_queue[loc:] + [(track_num - 1, -1)] + seek_queue[loc - 1::-1]
+
+
+def baseline_C_SCAN(seek_queue, head, track_num):
+    seek_queue, loc = baseline_sweep(seek_queue, head)
+    if seek_queue[loc:] == seek_queue:
+        return seek_queue
+    return seek_queue[loc:] + [(track_num - 1, -1), (0, -1)] + seek_queue[:loc]
+
+
+def baseline_LOOK(seek_queue, head, track_num):
+    seek_queue, loc = baseline_sweep(seek_queue, head)
+    if seek_queue[loc:] == seek_queue:
+        return seek_queue
+    return seek_queue[loc:] + seek_queue[loc - 1::-1]
+
+
+def baseline_C_LOOK(seek_queue, head, track_num):
+    seek_queue, loc = baseline_sweep(seek_queue, head)
+    return seek_queue[loc:] + seek_queue[:loc]
+
+
+baselines = {'SSTF': baseline_SSTF, 'SCAN': baseline_SCAN, 'C_SCAN': baseline_C_SCAN,
+             'LOOK': baseline_LOOK, 'C_LOOK': baseline_C_LOOK}
+
+
+def random_queue(rng, n, track_num, secs=12):
+    # 磁道号取值范围小, 使同一磁道与距离相等的请求经常出现
+    tracks = rng.integers(0, track_num, n).tolist()
+    sectors = rng.integers(0, secs, n).tolist()
+    return list(zip(tracks, sectors))
+
+
+@pytest.mark.parametrize('algo', sorted(baselines))
+@pytest.mark.parametrize('seed', range(20))
+def test_order_matches_baseline(algo, seed):
+    rng = np.random.default_rng(seed)
+    track_num = int(rng.choice([8, 200]))
+    seek_queue = random_queue(rng, int(rng.integers(1, 40)), track_num)
+    for head in {0, track_num - 1, int(rng.integers(track_num))}:
+        disk = Disk(512, track_num, 12, now_headpointer=head)
+        assert getattr(disk, '_order_' + algo)(list(seek_queue)) == \
+            baselines[algo](seek_queue, head, track_num)
+
+
+def test_order_keeps_fcfs_and_empty_queue():
+    disk = Disk(512, 200, 12)
+    seek_queue = [(98, 3), (183, 5), (37, 2)]
+    assert disk._order_FCFS(list(seek_queue)) == seek_queue
+    for algo in baselines:
+        assert getattr(disk, '_order_' + algo)([]) == []
+
+
+# 参照实现: 每一步都在全部请求中找最早到期的未访问请求与扫描方向上的下一个请求
+def reference_DEADLINE(disk, seek_queue, deadlines):
+    n = len(seek_queue)
+    order = sorted(range(n), key=lambda i: seek_queue[i][0])
+    tracks = [seek_queue[i][0] for i in order]
+    served = [False] * n
+    seek_time, rotate_time = disk.seek_speed / disk.x_slow, disk.rotate_speed / disk.x_slow
+    now, head = disk.clock, disk.now_headpointer
+    loc = bisect_left(tracks, head)
+    temp_seek_queue = []
+    for _ in range(n):
+        unserved = [k for k in range(n) if not served[k]]
+        oldest = min(unserved, key=lambda k: (deadlines[order[k]], order[k]))
+        if deadlines[order[oldest]] <= now:
+            k = oldest
+        else:
+            ahead = [k for k in unserved if k >= loc]
+            k = ahead[0] if ahead else unserved[0]
+        served[k] = True
+        seek_addr = seek_queue[order[k]]
+        temp_seek_queue.append(seek_addr)
+        now += abs(tracks[k] - head) * seek_time + (rotate_time if seek_addr[1] != -1 else 0)
+        head = tracks[k]
+        loc = k + 1
+    return temp_seek_queue
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_deadline_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    track_num = int(rng.choice([8, 200]))
+    n = int(rng.integers(1, 60))
+    seek_queue = random_queue(rng, n, track_num)
+    disk = Disk(512, track_num, 12, now_headpointer=int(rng.integers(track_num)))
+    disk.clock = float(rng.random())
+    # 截止时间与每次访问的代价(约4 ms)相当, 扫描中途会有请求到期
+    deadlines = (disk.clock + rng.random(n) * n * 0.004).tolist()
+    expected = reference_DEADLINE(disk, seek_queue, deadlines)
+    assert disk._order_DEADLINE(list(seek_queue), deadlines) == expected
+    assert disk.schedule(list(seek_queue), 'DEADLINE', deadlines) == expected
+
+
+def test_deadline_without_expiry_is_one_way_scan():
+    disk = Disk(512, 200, 12, now_headpointer=100)
+    seek_queue = [(150, 0), (20, 1), (120, 2), (60, 3)]
+    assert disk._order_DEADLINE(list(seek_queue)) == [(120, 2), (150, 0), (20, 1), (60, 3)]
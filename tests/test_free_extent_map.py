@@ -0,0 +1,82 @@
+# coding=utf-8
+import numpy as np
+import pytest
+
+from file_manager import FreeExtentMap
+
+
+# 参照实现: 直接扫描bitmap(1为空闲)得到空闲区段
+def bitmap_extents(bitmap):
+    extents, start = [], None
+    for i, bit in enumerate(list(bitmap) + [0]):
+        if bit and start is None:
+            start = i
+        elif not bit and start is not None:
+            extents.append((start, i - start))
+            start = None
+    return extents
+
+
+def reference_fit(extents, num, method):
+    candidates = [extent for extent in extents if extent[1] >= num]
+    if not candidates:
+        return -1
+    if method == 'first':
+        return candidates[0][0]
+    if method == 'best':  # 最短的区段, 等长时取起点最小者
+        return min(candidates, key=lambda extent: (extent[1], extent[0]))[0]
+    return min(extents, key=lambda extent: (-extent[1], extent[0]))[0]
+
+
+def check_against_bitmap(free_map, bitmap, rng):
+    extents = bitmap_extents(bitmap)
+    assert free_map.extents() == extents
+    assert free_map.free_blocks == int(bitmap.sum())
+    assert free_map.largest() == max((extent[1] for extent in extents), default=0)
+    for num in [1, 2, 3] + rng.integers(1, len(bitmap) + 2, 5).tolist():
+        assert free_map.first_fit(num) == reference_fit(extents, num, 'first')
+        assert free_map.best_fit(num) == reference_fit(extents, num, 'best')
+        assert free_map.worst_fit(num) == reference_fit(extents, num, 'worst')
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('block_number', [1, 37, 300])
+def test_allocate_and_release_match_bitmap(seed, block_number):
+    rng = np.random.default_rng(seed)
+    bitmap = np.ones(block_number, dtype=np.uint8)
+    free_map = FreeExtentMap(block_number)
+    free_map.build(bitmap)
+    for _ in range(300):
+        free_runs = bitmap_extents(bitmap)
+        used_runs = bitmap_extents(1 - bitmap)
+        if free_runs and (not used_runs or rng.random() < 0.55):
+            # 在某个空闲区段内分配一段
+            start, length = free_runs[rng.integers(len(free_runs))]
+            offset = int(rng.integers(length))
+            num = int(rng.integers(1, length - offset + 1))
+            free_map.allocate(start + offset, num)
+            bitmap[start + offset:start + offset + num] = 0
+        else:
+            # 在某个已占用区段内释放一段
+            start, length = used_runs[rng.integers(len(used_runs))]
+            offset = int(rng.integers(length))
+            num = int(rng.integers(1, length - offset + 1))
+            free_map.release(start + offset, num)
+            bitmap[start + offset:start + offset + num] = 1
+        check_against_bitmap(free_map, bitmap, rng)
+    # 增量维护的结果与一次性重建的相同
+    rebuilt = FreeExtentMap(block_number)
+    rebuilt.build(bitmap)
+    assert rebuilt.extents() == free_map.extents()
+    assert rebuilt.by_size == free_map.by_size
+    assert list(rebuilt.tree) == list(free_map.tree)
+
+
+def test_allocate_rejects_used_blocks():
+    free_map = FreeExtentMap(16)
+    free_map.build(np.ones(16))
+    free_map.allocate(4, 4)
+    with pytest.raises(ValueError):
+        free_map.allocate(6, 1)
+    with pytest.raises(ValueError):
+        free_map.allocate(2, 3)
@@ -0,0 +1,199 @@
+# coding=utf-8
+from functools import lru_cache
+
+import numpy as np
+import pytest
+
+from memory_manager import MemoryManager, OPTPolicy, replay_page_trace
+
+
+def check_frames(mm):
+    # physical_memory and page_frame are inverse maps, the other frames are free
+    resident = {}
+    for frame, page in enumerate(mm.physical_memory):
+        if page != -1:
+            assert mm.page_frame[page] == frame
+            resident[page] = frame
+    assert sorted(mm.free_frames) == [frame for frame, page in enumerate(mm.physical_memory) if page == -1]
+    assert {page: frame for page, frame in enumerate(mm.page_frame) if frame != -1} == resident
+    # the page tables agree with the frames
+    for pid, ptable in mm.page_tables.items():
+        for page in ptable.pages:
+            assert mm.virtual_memory[page][1] == pid
+            frame, valid = ptable.lookup(page)
+            assert (valid == 1) == (page in resident)
+            if valid == 1:
+                assert frame == resident[page]
+    assert mm.physicalsize == sum(int(mm.virtual_memory[page][0]) for page in resident)
+    # the replacement algorithm keeps exactly the pages in physical memory
+    assert len(mm.replacement) == len(resident) and all(page in mm.replacement for page in resident)
+    return resident
+
+
+def random_run(mm, rng, steps, processes=4, max_pages=4):
+    live = []  # (pid, aid)
+    for _ in range(steps):
+        op = rng.random()
+        if op < 0.15 and len(live) * max_pages * 2 < mm.pn:
+            pid = int(rng.integers(processes))
+            size = int(rng.integers(1, max_pages * mm.ps + 1))
+            live.append((pid, mm.alloc(pid, size)))
+        elif op < 0.25 and live:
+            pid, aid = live.pop(int(rng.integers(len(live))))
+            assert mm.free(pid, aid)
+        elif live:
+            pid = live[int(rng.integers(len(live)))][0]
+            ptable = mm.page_tables[pid]
+            idx = int(rng.integers(len(ptable)))
+            page_size = int(mm.virtual_memory[ptable.pages[idx]][0])
+            mm.access(pid, idx * mm.ps + int(rng.integers(min(page_size, mm.ps - 1) + 1)))
+        check_frames(mm)
+    return live
+
+
+@pytest.mark.parametrize('schedule', sorted(MemoryManager.replacements))
+@pytest.mark.parametrize('seed', range(5))
+def test_frames_stay_consistent(schedule, seed):
+    rng = np.random.default_rng(seed)
+    mm = MemoryManager(mode='p', page_size=64, page_number=256, physical_page=5, schedule=schedule)
+    live = random_run(mm, rng, 1500)
+    for pid, aid in live:
+        assert mm.free(pid, aid)
+    assert check_frames(mm) == {}
+    assert mm.allocated == 0
+
+
+def check_pages(mm):
+    # every virtual page is either free or in exactly one allocation
+    allocated = [page for allocations in mm.pid_pages.values() for pages in allocations.values()
+                 for page in pages]
+    assert sorted(allocated + mm.free_pages) == list(range(mm.pn))
+    assert all(mm.virtual_memory[page][1] == -1 for page in mm.free_pages)
+    assert mm.allocated == sum(int(mm.virtual_memory[page][0]) for page in allocated)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_virtual_pages_free_or_allocated(seed):
+    rng = np.random.default_rng(seed)
+    mm = MemoryManager(mode='p', page_size=64, page_number=40, physical_page=3)
+    live = []
+    for _ in range(400):
+        if live and rng.random() < 0.4:
+            pid, aid = live.pop(int(rng.integers(len(live))))
+            assert mm.free(pid, aid)
+        else:
+            # large enough that some allocations fail
+            pid, size = int(rng.integers(3)), int(rng.integers(0, 10 * 64))
+            aid = mm.alloc(pid, size)
+            if aid == -1:
+                assert max(1, -(-size // 64)) > len(mm.free_pages)
+            else:
+                live.append((pid, aid))
+        check_pages(mm)
+        check_frames(mm)
+
+
+def test_zero_size_allocation_takes_one_page():
+    mm = MemoryManager(mode='p', page_size=64, page_number=4, physical_page=2)
+    aid = mm.alloc(0, 0)
+    assert aid != -1
+    assert len(mm.page_tables[0]) == 1 and len(mm.free_pages) == 3
+    mm.access(0, 0)
+    assert mm.page_fault == 1
+    assert mm.free(0, aid)
+    assert len(mm.free_pages) == 4 and mm.allocated == 0
+    check_frames(mm)
+
+
+def belady_faults(trace, capacity):
+    # brute force: try every possible victim at every page fault
+    @lru_cache(maxsize=None)
+    def faults(t, resident):
+        if t == len(trace):
+            return 0
+        pnum = trace[t]
+        if pnum < 0:
+            return faults(t + 1, resident - {-1 - pnum})
+        if pnum in resident:
+            return faults(t + 1, resident)
+        if len(resident) < capacity:
+            return 1 + faults(t + 1, resident | {pnum})
+        return 1 + min(faults(t + 1, resident - {victim} | {pnum}) for victim in resident)
+    return faults(0, frozenset())
+
+
+def random_page_trace(rng, n, pages, free_rate=0.1):
+    trace = []
+    for pnum in rng.integers(0, pages, n).tolist():
+        trace.append(-1 - pnum if rng.random() < free_rate else pnum)
+    return trace
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_opt_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    capacity = int(rng.integers(1, 4))
+    trace = random_page_trace(rng, 14, 5)
+    assert replay_page_trace(trace, capacity, 'OPT') == belady_faults(trace, capacity)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_opt_is_a_lower_bound(seed):
+    rng = np.random.default_rng(seed)
+    trace = random_page_trace(rng, 3000, 30, free_rate=0.02)
+    opt = replay_page_trace(trace, 6, 'OPT')
+    for schedule in MemoryManager.replacements:
+        assert opt <= replay_page_trace(trace, 6, schedule)
+
+
+def test_opt_rejects_a_different_sequence():
+    policy = OPTPolicy(2, [1, 2, -2, 3])
+    assert not policy.request(1)
+    with pytest.raises(ValueError):
+        policy.request(3)
+
+
+@pytest.mark.parametrize('schedule', sorted(MemoryManager.replacements))
+def test_replay_matches_online_page_faults(schedule):
+    # a trace shorter than the window is replayed from the start, so the
+    # replay sees the same accesses and frees as the running algorithm
+    rng = np.random.default_rng(0)
+    mm = MemoryManager(mode='p', page_size=64, page_number=256, physical_page=5, schedule=schedule)
+    random_run(mm, rng, 1000)
+    assert mm.trace_events <= mm.trace_window
+    rate, opt_rate, accesses = mm.window_fault_rates()
+    assert accesses == mm.page_access
+    assert rate == pytest.approx(mm.page_fault / accesses)
+    assert opt_rate <= rate
+
+
+def linear_access(mm, pid, address):
+    # reference: walk the process's allocations in the order of their start addresses
+    allocations = sorted((start, size) for start, size, owner, _ in mm.r if owner == pid)
+    if not allocations or address < 0 or address > sum(size for _, size in allocations):
+        return -1
+    for start, size in allocations:
+        if address < size:
+            return start + address
+        address -= size
+    return start + size  # the end of the last allocation
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_continue_access_matches_linear_scan(seed):
+    rng = np.random.default_rng(seed)
+    mm = MemoryManager(mode='cb', page_size=64, page_number=64)
+    live = []
+    for _ in range(300):
+        if live and rng.random() < 0.35:
+            pid, aid = live.pop(int(rng.integers(len(live))))
+            assert mm.free(pid, aid)
+        else:
+            pid = int(rng.integers(4))
+            aid = mm.alloc(pid, int(rng.integers(1, 400)))
+            if aid != -1:
+                live.append((pid, aid))
+        for pid in range(4):
+            total = sum(size for _, size, owner, _ in mm.r if owner == pid)
+            for address in [0, total, total + 1] + rng.integers(0, total + 1, 8).tolist():
+                assert mm.continue_access(pid, address) == linear_access(mm, pid, address)
@@ -0,0 +1,90 @@
+# coding=utf-8
+import numpy as np
+import pytest
+
+from memory_manager import PageTable
+
+
+class ListPageTable:
+    """
+    reference model: the entries as a plain list of [virtual page, frame, valid]
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def find(self, page_num):
+        return [entry[0] for entry in self.entries].index(page_num)
+
+    def insert(self, page_num):
+        self.entries.append([page_num, -1, -1])
+
+    def delete(self, page_num):
+        self.entries.pop(self.find(page_num))
+
+    def modify(self, pnum, fnum, valid):
+        entry = self.entries[self.find(pnum)]
+        if valid == 1:
+            entry[1] = fnum
+        entry[2] = valid
+
+
+def check_table(ptable, model, page_size, rng):
+    assert len(ptable) == len(model.entries)
+    assert list(ptable.pages) == [entry[0] for entry in model.entries]
+    for page_num, frame, valid in model.entries:
+        assert ptable.lookup(page_num) == [frame, valid]
+    for address in rng.integers(0, (len(model.entries) + 2) * page_size, 10).tolist():
+        idx = address // page_size
+        expected = model.entries[idx][0] if idx < len(model.entries) else -1
+        assert ptable.transform(address, page_size) == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_page_table_matches_list_model(seed):
+    rng = np.random.default_rng(seed)
+    ptable, model = PageTable(), ListPageTable()
+    free = list(range(200))
+    rng.shuffle(free)
+    for _ in range(600):
+        op = rng.random()
+        if op < 0.45 and free:
+            page_num = free.pop()
+            ptable.insert(page_num)
+            model.insert(page_num)
+        elif op < 0.7 and model.entries:
+            page_num = model.entries[rng.integers(len(model.entries))][0]
+            ptable.delete(page_num)
+            model.delete(page_num)
+            free.insert(0, page_num)
+        elif model.entries:
+            page_num = model.entries[rng.integers(len(model.entries))][0]
+            fnum, valid = int(rng.integers(8)), int(rng.choice([1, -1]))
+            ptable.modify(page_num, fnum, valid)
+            model.modify(page_num, fnum, valid)
+        check_table(ptable, model, 1024, rng)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_delete_pages_removes_each_run(seed):
+    rng = np.random.default_rng(seed)
+    ptable, model = PageTable(), ListPageTable()
+    allocations, next_page = [], 0
+    for _ in range(200):
+        if allocations and rng.random() < 0.4:
+            # free a whole allocation, or the pages of several (non-adjacent) allocations at once
+            picked = rng.choice(len(allocations), int(rng.integers(1, min(3, len(allocations)) + 1)),
+                                replace=False).tolist()
+            pages = [page for i in picked for page in allocations[i]]
+            allocations = [pages for i, pages in enumerate(allocations) if i not in picked]
+            ptable.delete_pages(pages)
+            for page_num in pages:
+                model.delete(page_num)
+        else:
+            pages = list(range(next_page, next_page + int(rng.integers(1, 6))))
+            next_page += len(pages)
+            allocations.append(pages)
+            for page_num in pages:
+                ptable.insert(page_num)
+                model.insert(page_num)
+        check_table(ptable, model, 1024, rng)